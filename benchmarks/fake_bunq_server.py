@@ -0,0 +1,319 @@
+"""Local stand-in for the bunq endpoints used by the integration."""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from base64 import b64encode
+
+from aiohttp import ClientSession, web
+from Cryptodome.Hash import SHA256
+from Cryptodome.PublicKey import RSA
+from Cryptodome.Signature import PKCS1_v1_5
+
+USER_ID = 1234
+SESSION_TIMEOUT = 7 * 24 * 3600
+
+
+class FakeBunqServer:
+    """Serve generated accounts, payments and cards with optional latency and 429s.
+
+    Payments added with post_payment() are pushed, signed, to the callback urls
+    registered for the PAYMENT category through notification-filter-url.
+    """
+
+    def __init__(
+        self,
+        *,
+        accounts: int = 1,
+        payments: int = 50,
+        cards: int = 1,
+        latency: float = 0.0,
+        rate_limit_ratio: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        """Generate the data set."""
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self._random = random.Random(seed)
+        self.requests = 0
+        self.rate_limited = 0
+        self.bytes_sent = 0
+        self.accounts = [self._account(index + 1) for index in range(accounts)]
+        # payments per account id, newest first
+        self.payments = {
+            account["id"]: [
+                self._payment(account, number) for number in range(payments, 0, -1)
+            ]
+            for account in self.accounts
+        }
+        self.cards = [
+            self._card(index + 1, self.accounts[index % len(self.accounts)]["id"])
+            for index in range(cards)
+        ]
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+        self._server_key = RSA.generate(2048)
+        self.callback_urls: list[str] = []
+
+    def _account(self, index):
+        return {
+            "id": index,
+            "created": "2020-01-01 00:00:00.000000",
+            "updated": "2024-01-01 00:00:00.000000",
+            "description": f"Account {index}",
+            "currency": "EUR",
+            "status": "ACTIVE",
+            "balance": {"value": f"{index * 100}.00", "currency": "EUR"},
+            "alias": [
+                {"type": "IBAN", "value": f"NL00BUNQ{index:010d}", "name": "Test User"},
+                {"type": "EMAIL", "value": "test@example.com", "name": "Test User"},
+            ],
+            "daily_limit": {"value": "1000.00", "currency": "EUR"},
+            "setting": {"color": "#FE2851", "default_avatar_status": "AVATAR_DEFAULT"},
+        }
+
+    def _payment(self, account, number):
+        amount = self._random.randint(-5000, 5000) / 100
+        return {
+            "id": account["id"] * 1_000_000 + number,
+            "created": f"2024-01-01 00:00:{number % 60:02d}.{number:06d}",
+            "updated": f"2024-01-01 00:00:{number % 60:02d}.{number:06d}",
+            "monetary_account_id": account["id"],
+            "amount": {"value": f"{amount:.2f}", "currency": "EUR"},
+            "description": f"Payment {number}",
+            "type": "BUNQ",
+            "alias": {"iban": account["alias"][0]["value"], "display_name": "Test User"},
+            "counterparty_alias": {
+                "iban": f"NL00BANK{number:010d}",
+                "display_name": f"Counterparty {number % 20}",
+                "country": "NL",
+            },
+            "attachment": [],
+            "geolocation": {"latitude": 52.37, "longitude": 4.89, "altitude": 0},
+            "balance_after_mutation": account["balance"],
+        }
+
+    def _card(self, index, account_id):
+        return {
+            "id": 9000 + index,
+            "status": "ACTIVE",
+            "product_type": "MASTERCARD_DEBIT",
+            "expiry_date": "2030-01-31",
+            "card_limit": {"value": "1000.00", "currency": "EUR"},
+            "card_limit_atm": {"value": "500.00", "currency": "EUR"},
+            "pin_code_assignment": [
+                {
+                    "id": index,
+                    "type": "PRIMARY",
+                    "status": "ACTIVE",
+                    "monetary_account_id": account_id,
+                    "created": "2020-01-01 00:00:00.000000",
+                    "updated": "2020-01-01 00:00:00.000000",
+                }
+            ],
+        }
+
+    async def start(self) -> str:
+        """Start listening on a free local port, return the base url."""
+        app = web.Application(middlewares=[self._middleware])
+        user = f"/v1/user/{USER_ID}"
+        app.router.add_post("/v1/installation", self._installation)
+        app.router.add_post("/v1/device-server", self._device_server)
+        app.router.add_post("/v1/session-server", self._session_server)
+        app.router.add_get(f"{user}/monetary-account", self._accounts)
+        app.router.add_get(f"{user}/monetary-account/{{account_id}}", self._account_get)
+        app.router.add_get(
+            f"{user}/monetary-account/{{account_id}}/payment", self._payment_list
+        )
+        app.router.add_post(
+            f"{user}/monetary-account/{{account_id}}/payment", self._created
+        )
+        app.router.add_post(
+            f"{user}/monetary-account/{{account_id}}/payment-batch", self._created
+        )
+        app.router.add_get(f"{user}/card", self._cards)
+        app.router.add_get(f"{user}/card/{{card_id}}", self._card_get)
+        app.router.add_put(f"{user}/card/{{card_id}}", self._created)
+        app.router.add_post(
+            f"{user}/notification-filter-url", self._notification_filters
+        )
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        """Stop the server."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def reset_counters(self) -> None:
+        """Reset the request statistics."""
+        self.requests = 0
+        self.rate_limited = 0
+        self.bytes_sent = 0
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.method == "GET" and self._random.random() < self.rate_limit_ratio:
+            self.rate_limited += 1
+            return web.json_response(
+                {"Error": [{"error_description": "Too many requests"}]}, status=429
+            )
+        response = await handler(request)
+        self.bytes_sent += len(response.body or b"")
+        return response
+
+    def _json(self, data):
+        return web.Response(
+            body=json.dumps(data).encode(), content_type="application/json"
+        )
+
+    def _listing(self, request, items, path):
+        """Page through items (newest first) like bunq does."""
+        count = int(request.query.get("count", 10))
+        ids = [next(iter(item.values()))["id"] for item in items]
+        if "newer_id" in request.query:
+            newer_id = int(request.query["newer_id"])
+            newer = [index for index, id_ in enumerate(ids) if id_ > newer_id]
+            # the oldest items newer than the cursor
+            page_indexes = newer[-count:]
+            more = len(newer) > count
+        else:
+            start = 0
+            if "older_id" in request.query:
+                older_id = int(request.query["older_id"])
+                start = next(
+                    (index for index, id_ in enumerate(ids) if id_ < older_id), len(ids)
+                )
+            page_indexes = list(range(start, min(start + count, len(ids))))
+            more = start + count < len(ids)
+        page = [items[index] for index in page_indexes]
+        pagination = {"older_url": None, "newer_url": None, "future_url": None}
+        if page and more and "newer_id" not in request.query:
+            last_id = ids[page_indexes[-1]]
+            pagination["older_url"] = f"{path}?count={count}&older_id={last_id}"
+        if page and more and "newer_id" in request.query:
+            first_id = ids[page_indexes[0]]
+            pagination["newer_url"] = f"{path}?count={count}&newer_id={first_id}"
+        return self._json({"Response": page, "Pagination": pagination})
+
+    async def _installation(self, request):
+        return self._json(
+            {
+                "Response": [
+                    {"Id": {"id": 1}},
+                    {"Token": {"token": "installation-token"}},
+                    {
+                        "ServerPublicKey": {
+                            "server_public_key": self._server_key.publickey()
+                            .export_key()
+                            .decode()
+                        }
+                    },
+                ]
+            }
+        )
+
+    async def _device_server(self, request):
+        return self._json({"Response": [{"Id": {"id": 1}}]})
+
+    async def _session_server(self, request):
+        return self._json(
+            {
+                "Response": [
+                    {"Id": {"id": 1}},
+                    {"Token": {"token": "session-token"}},
+                    {
+                        "UserApiKey": {
+                            "id": USER_ID,
+                            "requested_by_user": {
+                                "UserPerson": {"session_timeout": SESSION_TIMEOUT}
+                            },
+                        }
+                    },
+                ]
+            }
+        )
+
+    async def _accounts(self, request):
+        items = [{"MonetaryAccountBank": account} for account in reversed(self.accounts)]
+        return self._listing(request, items, request.path)
+
+    async def _account_get(self, request):
+        account_id = int(request.match_info["account_id"])
+        account = next(item for item in self.accounts if item["id"] == account_id)
+        return self._json({"Response": [{"MonetaryAccountBank": account}]})
+
+    async def _payment_list(self, request):
+        account_id = int(request.match_info["account_id"])
+        items = [{"Payment": payment} for payment in self.payments[account_id]]
+        return self._listing(request, items, request.path)
+
+    async def _cards(self, request):
+        items = [{"CardDebit": card} for card in reversed(self.cards)]
+        return self._listing(request, items, request.path)
+
+    async def _card_get(self, request):
+        card_id = int(request.match_info["card_id"])
+        card = next(item for item in self.cards if item["id"] == card_id)
+        return self._json({"Response": [{"CardDebit": card}]})
+
+    async def _notification_filters(self, request):
+        body = await request.json()
+        self.callback_urls = [
+            item["notification_target"]
+            for item in body["notification_filters"]
+            if item["category"] == "PAYMENT"
+        ]
+        return await self._created(request)
+
+    async def post_payment(self, account_id) -> list[int]:
+        """Add a payment to an account and push it to the callback urls.
+
+        Returns the status of each callback.
+        """
+        account = next(item for item in self.accounts if item["id"] == account_id)
+        payments = self.payments[account_id]
+        number = payments[0]["id"] % 1_000_000 + 1 if payments else 1
+        payment = self._payment(account, number)
+        balance = float(account["balance"]["value"]) + float(payment["amount"]["value"])
+        account["balance"] = {"value": f"{balance:.2f}", "currency": "EUR"}
+        payment["balance_after_mutation"] = account["balance"]
+        payments.insert(0, payment)
+
+        body = json.dumps(
+            {
+                "NotificationUrl": {
+                    "category": "PAYMENT",
+                    "event_type": "PAYMENT_CREATED",
+                    "object": {"Payment": payment},
+                }
+            }
+        ).encode()
+        signature = b64encode(
+            PKCS1_v1_5.new(self._server_key).sign(SHA256.new(body))
+        ).decode()
+        statuses = []
+        async with ClientSession() as session:
+            for url in self.callback_urls:
+                async with session.post(
+                    url,
+                    data=body,
+                    headers={
+                        "Content-Type": "application/json",
+                        "X-Bunq-Server-Signature": signature,
+                    },
+                ) as response:
+                    statuses.append(response.status)
+        return statuses
+
+    async def _created(self, request):
+        return self._json({"Response": [{"Id": {"id": self._random.randint(1, 10**9)}}]})
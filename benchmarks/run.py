@@ -0,0 +1,230 @@
+"""Benchmark the bunq integration against a local fake bunq API.
+
+Run from the repository root (Home Assistant must be installed):
+
+    python -m benchmarks.run --accounts 1 10 50 200 --latency 0.05
+
+With --record DIR the exchanges of each scenario are written to a cassette,
+with --replay DIR they are served from it without starting the fake server.
+With --push N, N payments are pushed by the fake server to a local callback.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from aiohttp import ClientSession, web
+
+from custom_components.bunq.bunq_api import BunqApi
+from custom_components.bunq.bunq_balance_sensor import BunqBalanceSensor
+from custom_components.bunq.bunq_card_sensor import BunqCardSensor
+from custom_components.bunq.const import PUSH_CATEGORIES, RATE_LIMITS
+from custom_components.bunq.metrics import BunqApiMetrics
+from custom_components.bunq.models import BunqApiEnvironment
+from custom_components.bunq.rate_limiter import BunqRateLimiter
+from custom_components.bunq.transport import (
+    AiohttpTransport,
+    RecordingTransport,
+    ReplayTransport,
+)
+
+from .fake_bunq_server import FakeBunqServer
+
+
+def requests_sent(api: BunqApi) -> int:
+    """Return the number of requests sent by the api."""
+    return sum(endpoint.requests for endpoint in api.metrics.endpoints.values())
+
+
+def bytes_received(api: BunqApi) -> int:
+    """Return the number of response bytes parsed by the api."""
+    return sum(endpoint.bytes_received for endpoint in api.metrics.endpoints.values())
+
+
+async def measure_push(api: BunqApi, server: FakeBunqServer, count: int) -> float:
+    """Return the mean time in ms from a pushed payment until it is applied."""
+
+    async def callback(request):
+        body = await request.read()
+        if not api.verify_server_signature(
+            body, request.headers.get("X-Bunq-Server-Signature")
+        ):
+            return web.Response(status=401)
+        if api.apply_notification(json.loads(body)) is None:
+            return web.Response(status=400)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post("/callback", callback)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        await api.update_notification_filters(
+            f"http://127.0.0.1:{port}/callback", PUSH_CATEGORIES
+        )
+        account_id = api.status.accounts[0].id
+        start = time.perf_counter()
+        for _ in range(count):
+            statuses = await server.post_payment(account_id)
+            if statuses != [200]:
+                raise RuntimeError(f"callback failed: {statuses}")
+        return (time.perf_counter() - start) * 1000 / count
+    finally:
+        await runner.cleanup()
+
+
+async def run_scenario(accounts: int, args) -> dict:
+    """Measure setup, refreshes and sensor updates for one data set."""
+    server = None
+    session = None
+    api_url = "http://replay"
+    if args.replay:
+        transport = await ReplayTransport.load(
+            os.path.join(args.replay, f"accounts_{accounts}.jsonl"), args.time_scale
+        )
+    else:
+        server = FakeBunqServer(
+            accounts=accounts,
+            payments=args.payments,
+            cards=args.cards,
+            latency=args.latency,
+            rate_limit_ratio=args.rate_limit_ratio,
+        )
+        api_url = await server.start()
+        session = ClientSession()
+        transport = AiohttpTransport(session, 8)
+        if args.record:
+            os.makedirs(args.record, exist_ok=True)
+            path = os.path.join(args.record, f"accounts_{accounts}.jsonl")
+            if os.path.exists(path):
+                os.remove(path)
+            transport = RecordingTransport(transport, path)
+
+    api = BunqApi(
+        environment=BunqApiEnvironment.Sandbox,
+        token="benchmark-token",
+        api_url=api_url,
+        transport=transport,
+    )
+    if not args.rate_limit:
+        api.rate_limiter = BunqRateLimiter({})
+
+    result = {"accounts": accounts, "push_ms": float("nan")}
+    try:
+        tracemalloc.start()
+
+        start = time.perf_counter()
+        await api._setup_context()
+        result["setup_s"] = time.perf_counter() - start
+
+        api.metrics = BunqApiMetrics()
+        start = time.perf_counter()
+        await api.update()
+        result["first_refresh_s"] = time.perf_counter() - start
+        result["first_requests"] = requests_sent(api)
+        result["first_kb"] = bytes_received(api) / 1024
+        rate_limited = api.metrics.rate_limited
+
+        api.metrics = BunqApiMetrics()
+        start = time.perf_counter()
+        for _ in range(args.refreshes):
+            await api.update()
+        result["refresh_s"] = (time.perf_counter() - start) / args.refreshes
+        result["refresh_requests"] = requests_sent(api) / args.refreshes
+        result["refresh_kb"] = bytes_received(api) / 1024 / args.refreshes
+        result["rate_limited"] = rate_limited + api.metrics.rate_limited
+
+        coordinator = SimpleNamespace(bunq=api, entry=SimpleNamespace(options={}))
+        sensors = [BunqBalanceSensor(coordinator, account) for account in api.status.accounts]
+        sensors += [BunqCardSensor(coordinator, card) for card in api.status.cards]
+        start = time.perf_counter()
+        for sensor in sensors:
+            sensor._async_update_attrs()
+        result["sensors_ms"] = (time.perf_counter() - start) * 1000
+
+        if args.push and server is not None:
+            result["push_ms"] = await measure_push(api, server, args.push)
+
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+        # stops the session renewal timer before the loop goes away
+        await api.close()
+        if session is not None:
+            await session.close()
+        if server is not None:
+            await server.stop()
+    return result
+
+
+COLUMNS = [
+    ("accounts", "accounts", "{:d}"),
+    ("setup_s", "setup s", "{:.3f}"),
+    ("first_refresh_s", "1st refresh s", "{:.3f}"),
+    ("first_requests", "1st requests", "{:d}"),
+    ("first_kb", "1st KB", "{:.1f}"),
+    ("refresh_s", "refresh s", "{:.3f}"),
+    ("refresh_requests", "requests", "{:.1f}"),
+    ("refresh_kb", "KB", "{:.1f}"),
+    ("rate_limited", "429s", "{:d}"),
+    ("sensors_ms", "sensors ms", "{:.2f}"),
+    ("push_ms", "push ms", "{:.2f}"),
+    ("peak_mb", "peak MB", "{:.1f}"),
+]
+
+
+def print_results(results) -> None:
+    """Print the results as a table."""
+    headers = [header for _, header, _ in COLUMNS]
+    rows = [[fmt.format(result[key]) for key, _, fmt in COLUMNS] for result in results]
+    widths = [max(len(cell) for cell in column) for column in zip(headers, *rows)]
+    for row in [headers, *rows]:
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+
+
+async def main(args) -> None:
+    """Run all scenarios."""
+    results = [await run_scenario(accounts, args) for accounts in args.accounts]
+    print_results(results)
+
+
+def parse_args():
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--payments", type=int, default=50, help="payments per account")
+    parser.add_argument("--cards", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument(
+        "--rate-limit-ratio", type=float, default=0.0, help="share of requests answered with 429"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        action="store_true",
+        help=f"apply the client side rate limits {RATE_LIMITS}",
+    )
+    parser.add_argument("--refreshes", type=int, default=5, help="steady state refreshes")
+    parser.add_argument(
+        "--push", type=int, default=0, metavar="N", help="payments pushed to a callback"
+    )
+    parser.add_argument("--record", metavar="DIR", help="record cassettes to DIR")
+    parser.add_argument("--replay", metavar="DIR", help="replay cassettes from DIR")
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=0.0,
+        help="replay timing factor, 1 is the recorded timing and 0 full speed",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
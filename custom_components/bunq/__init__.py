@@ -1,12 +1,14 @@
 """Support for bunq account balance."""
+import os
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant, ServiceCall
 from homeassistant.helpers.config_entry_oauth2_flow import (
     OAuth2Session, async_get_config_entry_implementation)
+from homeassistant.helpers.storage import STORAGE_DIR, Store
 
-from .const import DOMAIN
+from .const import CONF_PUSH, DOMAIN, STORAGE_KEY, STORAGE_VERSION, TRANSACTIONS_DATABASE
 from .coordinator import BunqDataUpdateCoordinator
 from .services import async_setup_services
 
@@ -26,6 +28,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     hass.data[DOMAIN][entry.entry_id] = coordinator
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     await async_setup_services(hass, coordinator)
+    if entry.options.get(CONF_PUSH, False):
+        await coordinator.async_enable_push()
 
     entry.async_on_unload(entry.add_update_listener(async_update_options))
 
@@ -35,10 +39,21 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        del hass.data[DOMAIN][entry.entry_id]
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.async_close()
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored bunq context and transactions of a config entry."""
+    await Store(hass, STORAGE_VERSION, f"{STORAGE_KEY}.{entry.entry_id}").async_remove()
+    database = hass.config.path(
+        STORAGE_DIR, TRANSACTIONS_DATABASE.format(entry_id=entry.entry_id)
+    )
+    if await hass.async_add_executor_job(os.path.exists, database):
+        await hass.async_add_executor_job(os.remove, database)
+
+
 async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload the config entry when options change."""
     await hass.config_entries.async_reload(entry.entry_id)
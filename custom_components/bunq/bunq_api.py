@@ -1,27 +1,56 @@
 """ Bunq api class """
 
+from __future__ import annotations
+
 import asyncio
 import json
 import random
-import socket
-from base64 import b64encode
-from typing import Awaitable, Callable, Optional
+import time
+from base64 import b64decode, b64encode
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
-import async_timeout
-from aiohttp import ClientError, ClientResponse, ClientSession, hdrs
+from aiohttp import ClientResponse, ClientSession, hdrs
 from Crypto.PublicKey import RSA
 from Cryptodome.Hash import SHA256
 from Cryptodome.PublicKey.RSA import RsaKey
 from Cryptodome.Signature import PKCS1_v1_5
 
-from .const import ENVIRONMENT_URLS, LOGGER, BunqApiEnvironment
+from .circuit_breaker import CircuitBreaker
+from .const import (
+    CIRCUIT_BREAKER_THRESHOLD,
+    CIRCUIT_BREAKER_TIMEOUT,
+    ENVIRONMENT_URLS,
+    LOGGER,
+    MAX_CONCURRENT_REQUESTS,
+    PAGE_SIZE_MAX,
+    RATE_LIMITS,
+    RETRY_ATTEMPTS,
+    RETRY_BACKOFF,
+    SESSION_RENEW_MARGIN,
+    SESSION_TIMEOUT_DEFAULT,
+    TOKEN_CHECK_INTERVAL,
+    TRANSACTIONS_PAGE_SIZE,
+    BunqApiEnvironment,
+)
+from .debug_log import DebugPayload
 from .exceptions import (
     BunqApiConnectionError,
-    BunqApiConnectionTimeoutError,
     BunqApiError,
     BunqApiRateLimitError,
+    BunqApiValidationError,
 )
-from .models import BunqStatus
+from .metrics import BunqApiMetrics
+from .models import Account, BunqStatus, BunqUpdate, Card, Payment
+from .rate_limiter import BunqRateLimiter
+from .transport import AiohttpTransport, BunqTransport
+
+MONETARY_ACCOUNT_TYPES = [
+    "MonetaryAccountBank",
+    "MonetaryAccountJoint",
+    "MonetaryAccountLight",
+    "MonetaryAccountSavings",
+]
+CARD_TYPES = ["CardDebit", "CardCredit"]
 
 
 class BunqApi:
@@ -38,21 +67,48 @@ class BunqApi:
         session: Optional[ClientSession] = None,
         token_refresh_method: Optional[Callable[[], Awaitable[str]]] = None,
         allow_dynamic_ip: bool = False,
+        max_concurrent_requests: int = MAX_CONCURRENT_REQUESTS,
+        api_url: Optional[str] = None,
+        transport: Optional[BunqTransport] = None,
     ) -> None:
         """Initialize connection with the Bunq API."""
         self.keys = None
-        self._api_url = ENVIRONMENT_URLS[environment]["api_url"]
+        self.installation_token = None
+        self._server_public_key: str | None = None
+        self._server_key: RsaKey | None = None
+        self._pending_keys: asyncio.Future | None = None
+        self._context_lock = asyncio.Lock()
+        self._session_renewal: asyncio.Task | None = None
+        self._session_renewal_timer: asyncio.TimerHandle | None = None
+        # expiry of the session the renewal timer was set for
+        self._session_renewal_expiry: float | None = None
+        # balances whose transactions were fetched, per account id
+        self._polled_balances: dict = {}
+        self._api_url = api_url or ENVIRONMENT_URLS[environment]["api_url"]
         self.status = BunqStatus()
         self._session = session
+        self.transport = transport
         self.request_timeout = request_timeout
         self.token = token
         self.allow_dynamic_ip = allow_dynamic_ip
-        LOGGER.debug("Session token: %s", token)
         self.token_refresh_method = token_refresh_method
+        self._token_checked_at: float | None = None
         self._request_id = self._get_request_id(20)
+        self._semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self.rate_limiter = BunqRateLimiter(RATE_LIMITS)
+        self.metrics = BunqApiMetrics()
+        self.circuit_breaker = CircuitBreaker(
+            CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_TIMEOUT
+        )
 
     async def close(self) -> None:
-        """Close open client session."""
+        """Stop the session renewal and close open client session."""
+        if self._session_renewal_timer is not None:
+            self._session_renewal_timer.cancel()
+            self._session_renewal_timer = None
+        self._session_renewal_expiry = None
+        if self._session_renewal is not None:
+            self._session_renewal.cancel()
         if self._session and self._close_session:
             await self._session.close()
             LOGGER.debug("Session closed")
@@ -64,18 +120,52 @@ class BunqApi:
         return rid
 
     async def _request(self, method, uri, **kwargs) -> ClientResponse:
-        """Make a request."""
-        if self.token_refresh_method is not None:
-            self.token = await self.token_refresh_method()
-            LOGGER.debug("Token refresh method called")
+        """Make a request, retrying idempotent ones on transient errors."""
+        self.circuit_breaker.check()
+        attempts = RETRY_ATTEMPTS if method == hdrs.METH_GET else 1
+        for attempt in range(attempts):
+            try:
+                result = await self._request_once(method, uri, **kwargs)
+            except BunqApiError as error:
+                if not self._is_transient(error):
+                    # bunq answered, so it is reachable
+                    self.circuit_breaker.record_success()
+                    raise
+                if attempt + 1 >= attempts:
+                    self.circuit_breaker.record_failure()
+                    raise
+                delay = random.uniform(0, RETRY_BACKOFF * 2**attempt)
+                self.metrics.record_retry(method, uri)
+                LOGGER.debug(
+                    "%s request to %s failed (%s), retrying in %.2fs",
+                    method,
+                    uri,
+                    error,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+            else:
+                self.circuit_breaker.record_success()
+                return result
+
+    def _is_transient(self, error: BunqApiError) -> bool:
+        if isinstance(error, BunqApiConnectionError):
+            return True
+        return isinstance(error.args[0], int) and error.args[0] >= 500
 
+    async def _request_once(self, method, uri, **kwargs) -> ClientResponse:
+        """Make a single request."""
         url = self._api_url + uri
         headers = dict(kwargs.pop("headers", {}))
         token = kwargs.pop("token", None)
         signature = kwargs.pop("signature", "")
 
-        LOGGER.debug("Executing %s API request to %s", method, url)
-        LOGGER.debug("With body %s", str(kwargs.get("json")))
+        LOGGER.debug(
+            "Executing %s API request to %s with body %s",
+            method,
+            url,
+            DebugPayload(kwargs.get("json", kwargs.get("data"))),
+        )
 
         headers["Content-Type"] = "application/json"
         headers["User-Agent"] = "HomeAssistant"
@@ -87,35 +177,42 @@ class BunqApi:
             headers["X-Bunq-Client-Authentication"] = token
         headers["X-Bunq-Client-Request-Id"] = self._request_id
 
-        LOGGER.debug("With headers: %s", str(headers))
-        if self._session is None:
-            self._session = ClientSession()
-            LOGGER.debug("New session created")
-            self._close_session = True
+        LOGGER.debug("With headers: %s", DebugPayload(headers))
+        await self.rate_limiter.acquire(method)
 
+        started = time.monotonic()
+        error = None
         try:
-            with async_timeout.timeout(self.request_timeout):
-                response = await self._session.request(
-                    method,
-                    url,
-                    **kwargs,
-                    headers=headers,
-                )
-        except asyncio.TimeoutError as exception:
-            raise BunqApiConnectionTimeoutError(
-                "Timeout occurred while connecting to the Bunq API"
-            ) from exception
-        except (ClientError, socket.gaierror) as exception:
-            raise BunqApiConnectionError(
-                "Error occurred while communicating with the Bunq API"
-            ) from exception
-
-        content_type = response.headers.get("Content-Type", "")
+            return await self._send_request(method, uri, headers, **kwargs)
+        except BunqApiError as exception:
+            error = exception
+            raise
+        finally:
+            self.metrics.record_request(
+                method, uri, time.monotonic() - started, error
+            )
+
+    def _get_transport(self) -> BunqTransport:
+        if self.transport is None:
+            if self._session is None:
+                self._session = ClientSession()
+                LOGGER.debug("New session created")
+                self._close_session = True
+            self.transport = AiohttpTransport(self._session, self.request_timeout)
+        return self.transport
+
+    async def _send_request(self, method, uri, headers, **kwargs):
+        url = self._api_url + uri
+        response = await self._get_transport().send(method, url, headers, **kwargs)
+
+        content_type = response.content_type
         # Error handling
         if (response.status // 100) in [4, 5]:
-            contents = await response.read()
-            response.close()
-            LOGGER.debug("Error response (status %d): %s", response.status, contents)
+            contents = response.body
+            self.metrics.record_bytes(method, uri, len(contents))
+            LOGGER.debug(
+                "Error response (status %d): %s", response.status, DebugPayload(contents)
+            )
             if response.status == 429:
                 raise BunqApiRateLimitError(
                     "Rate limit error has occurred with the Bunq API"
@@ -133,27 +230,82 @@ class BunqApi:
             )
             return
 
+        contents = response.body
+        self.metrics.record_bytes(method, uri, len(contents))
+        LOGGER.debug("Response: %s", DebugPayload(contents))
         if "application/json" in content_type:
-            result = await response.json()
-            LOGGER.debug("Response: %s", str(result))
-            return result
-        result = await response.text()
-        LOGGER.debug("Response: %s", str(result))
-        return result
-
-    async def update(self) -> BunqStatus:
-        """update data from bunq"""
+            return json.loads(contents)
+        return contents.decode("utf8")
+
+    async def update(self, *, all_transactions=True, cards=True) -> BunqUpdate:
+        """update data from bunq
+
+        Without all_transactions, transactions are only fetched for the accounts
+        whose balance changed. Cards are only fetched when cards is set.
+        Returns what changed, the data itself is in status.
+        """
+        started = time.monotonic()
+        # after a handshake the token was just checked and this returns at once
         await self._setup_context()
+        await self._ensure_token()
+        self._schedule_session_renewal()
 
         await self._update_accounts()
+        balances = {account.id: account.balance for account in self.status.accounts}
+        # compared with the last successful update, so a balance change is not
+        # lost when fetching its transactions fails
+        result = BunqUpdate(
+            changed_account_ids=[
+                account_id
+                for account_id, balance in balances.items()
+                if self._polled_balances.get(account_id) != balance
+            ]
+        )
 
-        for account in self.status.accounts:
-            await self.update_account_transactions(account["id"])
-
-        await self._update_cards()
+        account_ids = result.changed_account_ids
+        if all_transactions:
+            account_ids = [account.id for account in self.status.accounts]
+        calls = [
+            self._bounded(self._get_account_transactions(account_id))
+            for account_id in account_ids
+        ]
+        if cards:
+            calls.append(self._bounded(self._update_cards()))
+        results = await asyncio.gather(*calls)
+        # results are ordered like the calls, so the merge is deterministic
+        for account_id, (transactions, polled_id) in zip(account_ids, results):
+            added = self.status.merge_account_transactions(
+                account_id, transactions, TRANSACTIONS_PAGE_SIZE
+            )
+            self.status.set_polled_transaction_id(account_id, polled_id)
+            result.new_transactions.extend((account_id, item) for item in added)
+            result.fetched_transactions.extend(
+                (account_id, item) for item in transactions
+            )
+        self._polled_balances = balances
 
+        self.metrics.record_refresh(time.monotonic() - started)
         LOGGER.info("Status updated")
-        return self.status
+        return result
+
+    async def _bounded(self, coroutine):
+        """Run a coroutine while holding one of the concurrency slots."""
+        async with self._semaphore:
+            return await coroutine
+
+    async def _ensure_token(self, force=False):
+        """Validate the oauth token, at most once per check interval."""
+        if self.token_refresh_method is None:
+            return
+        if (
+            not force
+            and self._token_checked_at is not None
+            and time.monotonic() - self._token_checked_at < TOKEN_CHECK_INTERVAL
+        ):
+            return
+        self.token = await self.token_refresh_method()
+        self._token_checked_at = time.monotonic()
+        LOGGER.debug("Token refresh method called")
 
     def _get_user_id(self, data):
         for value in data["Response"]:
@@ -165,8 +317,41 @@ class BunqApi:
             if "Token" in value:
                 return value["Token"]["token"]
 
+    def _get_server_public_key(self, data):
+        for value in data["Response"]:
+            if "ServerPublicKey" in value:
+                return value["ServerPublicKey"]["server_public_key"]
+
+    def _get_session_timeout(self, data):
+        for value in data["Response"]:
+            if "UserApiKey" in value:
+                requested_by = value["UserApiKey"].get("requested_by_user", {})
+                for user in requested_by.values():
+                    if user.get("session_timeout"):
+                        return user["session_timeout"]
+        return SESSION_TIMEOUT_DEFAULT
+
+    def prepare_keys(self) -> None:
+        """Start generating a key pair in the background for the next handshake."""
+        if self._pending_keys is None:
+            self._pending_keys = asyncio.get_running_loop().run_in_executor(
+                None, RSA.generate, 2048
+            )
+
+    async def _generate_keys(self) -> RsaKey:
+        """Get a new key pair, generated outside of the event loop."""
+        self.prepare_keys()
+        pending_keys, self._pending_keys = self._pending_keys, None
+        return await pending_keys
+
+    async def _sign(self, string_to_sign: str) -> str:
+        """Sign with the current keys, outside of the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._generate_signature, string_to_sign, self.keys
+        )
+
     def _generate_signature(self, string_to_sign: str, keys: RsaKey) -> str:
-        LOGGER.debug("signing %s", string_to_sign)
+        LOGGER.debug("signing %s", DebugPayload(string_to_sign))
         bytes_to_sign = string_to_sign.encode()
         signer = PKCS1_v1_5.new(keys)
         digest = SHA256.new()
@@ -175,119 +360,304 @@ class BunqApi:
         return b64encode(sign).decode("utf-8")
 
     async def _update_accounts(self):
+        session_token = self.status.session_token
         try:
             LOGGER.debug("Try to update accounts")
             await self._update_accounts_no_retry()
         except BunqApiError as error:
-            LOGGER.debug("Received error %s", str(error))
+            LOGGER.debug("Received error %s", error)
             if error.args[0] == 401:
                 LOGGER.debug("Retry to update accounts")
-                self.status.update_user(None, None)
-                await self._setup_context()
+                await self._reset_context(session_token)
                 await self._update_accounts_no_retry()
             else:
                 raise
 
     async def _update_accounts_no_retry(self):
         data = await self._fetch_monetary_accounts()
-        LOGGER.debug("get_active_accounts response: %s", data)
+        LOGGER.debug("received %d accounts", len(data))
         accounts = []
-        for value in data["Response"]:
-            for account_type in [
-                key
-                for key in value
-                if key
-                in [
-                    "MonetaryAccountBank",
-                    "MonetaryAccountJoint",
-                    "MonetaryAccountLight",
-                    "MonetaryAccountSavings",
-                ]
-            ]:
+        for value in data:
+            for account_type in [key for key in value if key in MONETARY_ACCOUNT_TYPES]:
                 item = value[account_type]
                 if "status" in item and item["status"] == "ACTIVE":
-                    accounts.append(item)
+                    accounts.append(Account.from_json(item))
         self.status.update_accounts(accounts)
 
     async def _update_cards(self):
         """update card data from bunq"""
+        session_token = self.status.session_token
         try:
             LOGGER.debug("Try to update cards")
             await self._update_cards_no_retry()
         except BunqApiError as error:
-            LOGGER.debug("Received error %s", str(error))
+            LOGGER.debug("Received error %s", error)
             if error.args[0] == 401:
                 LOGGER.debug("Retry to update cards")
-                self.status.update_user(None, None)
-                await self._setup_context()
+                await self._reset_context(session_token)
                 await self._update_cards_no_retry()
             else:
                 raise
 
     async def _update_cards_no_retry(self):
         data = await self._fetch_cards()
-        LOGGER.debug("get cards response: %s", data)
+        LOGGER.debug("received %d cards", len(data))
         cards = []
-        for value in data["Response"]:
-            for card_type in [
-                key for key in value if key in ["CardDebit", "CardCredit"]
-            ]:
+        for value in data:
+            for card_type in [key for key in value if key in CARD_TYPES]:
                 item = value[card_type]
                 if "status" in item and item["status"] == "ACTIVE":
-                    cards.append(item)
+                    cards.append(Card.from_json(item))
         self.status.update_cards(cards)
 
-    async def update_account_transactions(self, account_id):
-        """Get transactions of an account."""
-        data = await self._fetch_monetary_account_transactions(account_id)
-        LOGGER.debug("get_account_transactions response: %s", data)
-        transactions = []
-        for value in data["Response"]:
-            if "Payment" in value:
-                item = value["Payment"]
-                transactions.append(item)
-        self.status.update_account_transactions(account_id, transactions)
+    async def refresh_accounts(self, account_ids) -> BunqUpdate:
+        """Refresh the balance and transactions of some accounts only."""
+        result = BunqUpdate()
+        await asyncio.gather(
+            *(
+                self._bounded(self._refresh_account(account_id, result))
+                for account_id in account_ids
+            )
+        )
+        return result
 
-    async def _fetch_monetary_account_transactions(self, account_id):
-        return await self._request(
+    async def _refresh_account(self, account_id, result: BunqUpdate):
+        data = await self._request(
             hdrs.METH_GET,
-            f"/v1/user/{self.status.user_id}/monetary-account/{account_id}/payment",
+            f"/v1/user/{self.status.user_id}/monetary-account/{account_id}",
             token=self.status.session_token,
         )
+        for value in data["Response"]:
+            for account_type in [key for key in value if key in MONETARY_ACCOUNT_TYPES]:
+                self.status.update_account(Account.from_json(value[account_type]))
 
-    async def _fetch_monetary_accounts(self):
-        return await self._request(
+        transactions, polled_id = await self._get_account_transactions(account_id)
+        added = self.status.merge_account_transactions(
+            account_id, transactions, TRANSACTIONS_PAGE_SIZE
+        )
+        self.status.set_polled_transaction_id(account_id, polled_id)
+        result.new_transactions.extend((account_id, item) for item in added)
+        result.fetched_transactions.extend((account_id, item) for item in transactions)
+
+    async def refresh_card(self, card_id):
+        """Refresh a single card."""
+        data = await self._request(
             hdrs.METH_GET,
-            f"/v1/user/{self.status.user_id}/monetary-account?count=25",
+            f"/v1/user/{self.status.user_id}/card/{card_id}",
             token=self.status.session_token,
         )
+        for value in data["Response"]:
+            for card_type in [key for key in value if key in CARD_TYPES]:
+                self.status.update_card(Card.from_json(value[card_type]))
+
+    async def _get_account_transactions(self, account_id):
+        """Get the transactions newer than the ones already polled.
+
+        All of them are returned, even when there are more than the status keeps,
+        along with the transaction id the next poll resumes from.
+        """
+        newer_id = self.status.get_polled_transaction_id(account_id)
+        transactions = []
+        async for page in self.iterate_account_transactions(
+            account_id,
+            limit=TRANSACTIONS_PAGE_SIZE if newer_id is None else None,
+            newer_id=newer_id,
+            count=TRANSACTIONS_PAGE_SIZE if newer_id is None else PAGE_SIZE_MAX,
+        ):
+            transactions.extend(page)
+        LOGGER.debug(
+            "received %d transactions for account %s", len(transactions), account_id
+        )
+        # pages towards newer payments come oldest page first
+        transactions.sort(key=lambda transaction: transaction.id, reverse=True)
+        if transactions:
+            return transactions, transactions[0].id
+        # an account without transactions yet is polled from the start
+        return transactions, newer_id if newer_id is not None else 0
+
+    async def iterate_account_transactions(
+        self,
+        account_id,
+        *,
+        limit=None,
+        newer_id=None,
+        older_id=None,
+        count=PAGE_SIZE_MAX,
+    ) -> AsyncIterator[list[Payment]]:
+        """Yield the transactions of an account page by page.
+
+        Without newer_id the history is walked backwards, from the most recent
+        transaction or from older_id, otherwise only the transactions newer than
+        newer_id are walked.
+        """
+        uri = f"/v1/user/{self.status.user_id}/monetary-account/{account_id}/payment"
+        direction = "older_url"
+        if older_id is not None:
+            uri += f"?older_id={older_id}"
+        elif newer_id is not None:
+            uri += f"?newer_id={newer_id}"
+            direction = "newer_url"
+        async for page in self.iterate_pages(
+            uri, limit=limit, count=count, direction=direction
+        ):
+            yield [
+                Payment.from_json(value["Payment"]) for value in page if "Payment" in value
+            ]
+
+    async def iterate_pages(
+        self, uri, *, limit=None, count=PAGE_SIZE_MAX, direction="older_url"
+    ) -> AsyncIterator[list]:
+        """Yield the items of a bunq listing page by page.
+
+        The pagination urls are followed in the given direction until there is
+        no page left or limit items have been yielded.
+        """
+        if limit is not None:
+            count = min(count, limit)
+        url = f"{uri}{'&' if '?' in uri else '?'}count={count}"
+        remaining = limit
+        while url is not None:
+            data = await self._request(
+                hdrs.METH_GET, url, token=self.status.session_token
+            )
+            if data is None:
+                return
+            items = data["Response"]
+            if remaining is not None:
+                items = items[:remaining]
+                remaining -= len(items)
+            if len(items) > 0:
+                yield items
+            if remaining == 0:
+                return
+            url = (data.get("Pagination") or {}).get(direction)
+
+    async def _fetch_all(self, uri):
+        items = []
+        async for page in self.iterate_pages(uri):
+            items.extend(page)
+        return items
+
+    async def _fetch_monetary_accounts(self):
+        return await self._fetch_all(f"/v1/user/{self.status.user_id}/monetary-account")
 
     async def _fetch_cards(self):
+        return await self._fetch_all(f"/v1/user/{self.status.user_id}/card")
+
+    async def update_notification_filters(self, url, categories):
+        """Send the notifications of the given categories to a callback url.
+
+        Calling this with no categories removes the callbacks.
+        """
+        body = {
+            "notification_filters": [
+                {
+                    "category": category,
+                    "notification_delivery_method": "URL",
+                    "notification_target": url,
+                }
+                for category in categories
+            ]
+        }
+        str_body = json.dumps(body)
+        signature = await self._sign(str_body)
         return await self._request(
-            hdrs.METH_GET,
-            f"/v1/user/{self.status.user_id}/card",
+            hdrs.METH_POST,
+            f"/v1/user/{self.status.user_id}/notification-filter-url",
             token=self.status.session_token,
+            signature=signature,
+            data=str_body,
+        )
+
+    async def ensure_server_public_key(self) -> None:
+        """Install again when the bunq server public key is not known.
+
+        Contexts stored before the key was kept lack it, and callbacks can not
+        be verified without it.
+        """
+        async with self._context_lock:
+            if self.server_public_key is not None:
+                return
+            LOGGER.debug("no server public key known, installing again")
+            self.installation_token = None
+            self.status.update_user(None, None)
+            await self._setup_context_locked()
+
+    @property
+    def server_public_key(self) -> str | None:
+        """The PEM public key bunq signs its callbacks with."""
+        return self._server_public_key
+
+    @server_public_key.setter
+    def server_public_key(self, value: str | None) -> None:
+        # parsed once, callbacks are verified with the parsed key
+        self._server_public_key = value
+        self._server_key = RSA.import_key(value) if value is not None else None
+
+    def verify_server_signature(self, body: bytes, signature: str) -> bool:
+        """Check that a callback body was signed by bunq."""
+        if self._server_key is None:
+            LOGGER.debug("no server public key known, callback rejected")
+            return False
+        if not signature:
+            return False
+        digest = SHA256.new(body)
+        try:
+            return PKCS1_v1_5.new(self._server_key).verify(
+                digest, b64decode(signature)
+            )
+        except ValueError:
+            return False
+
+    def apply_notification(self, data) -> BunqUpdate | None:
+        """Apply a payment pushed by bunq to the status.
+
+        Returns None when the status did not change, otherwise the update holds
+        the payment when it was not known yet.
+        """
+        notification = data.get("NotificationUrl", {})
+        payment = notification.get("object", {}).get("Payment")
+        if payment is None:
+            LOGGER.debug("ignoring %s notification", notification.get("category"))
+            return None
+
+        account_id = payment.get("monetary_account_id")
+        account = self.status.get_account(account_id)
+        if account is None:
+            LOGGER.debug("notification for unknown account %s", account_id)
+            return None
+
+        result = BunqUpdate()
+        if "balance_after_mutation" in payment:
+            balance = payment["balance_after_mutation"]["value"]
+            if balance != account.balance:
+                account.balance = balance
+                result.changed_account_ids.append(account.id)
+        transaction = Payment.from_json(payment)
+        added = self.status.merge_account_transactions(
+            account_id, [transaction], TRANSACTIONS_PAGE_SIZE
         )
+        result.new_transactions.extend((account_id, item) for item in added)
+        result.fetched_transactions.append((account_id, transaction))
+        return result
 
     async def link_account_to_card(self, card_id, account_id):
         """Link an account to a card."""
 
         card = self.status.get_card(card_id)
         if card is None:
-            raise f"card {card_id} not found"
+            raise BunqApiValidationError(f"card {card_id} not found")
 
-        pins = card["pin_code_assignment"]
-        for pin in pins:
-            del pin["id"]
-            del pin["created"]
-            del pin["updated"]
-            del pin["status"]
-            if pin["type"] == "PRIMARY":
-                pin["monetary_account_id"] = int(account_id)
+        pins = []
+        for pin in card.pin_code_assignment:
+            data = pin.as_json()
+            if pin.type == "PRIMARY":
+                data["monetary_account_id"] = int(account_id)
+            pins.append(data)
 
         body = {"pin_code_assignment": pins}
         str_body = json.dumps(body)
-        signature = self._generate_signature(str_body, self.keys)
+        signature = await self._sign(str_body)
         result = await self._request(
             hdrs.METH_PUT,
             f"/v1/user/{self.status.user_id}/card/{card_id}",
@@ -295,31 +665,31 @@ class BunqApi:
             signature=signature,
             data=str_body,
         )
-        LOGGER.debug("link account response", json.dumps(result))
+        LOGGER.debug("link account response %s", DebugPayload(result))
 
         return result
 
-    async def transfer(self, from_account_id, to_account_id, amount, message):
-        """Transfer funds to one of your own accounts."""
-
+    def _build_payment(self, to_account_id, amount, message):
+        """Build the payment of a transfer to one of your own accounts."""
         to_account = self.status.get_account(to_account_id)
         if to_account is None:
-            raise f"target account {to_account} not found"
+            raise BunqApiValidationError(f"target account {to_account_id} not found")
 
-        if "alias" not in to_account or len(to_account["alias"]) == 0:
-            raise f"no alias found for {to_account}"
-        alias = to_account["alias"][0]
+        if to_account.alias is None:
+            raise BunqApiValidationError(f"no alias found for {to_account_id}")
 
-        if "currency" not in to_account:
-            raise f"currency not found for {to_account}"
-
-        body = {
-            "amount": {"value": str(amount), "currency": to_account["currency"]},
-            "counterparty_alias": alias,
+        return {
+            "amount": {"value": str(amount), "currency": to_account.currency},
+            "counterparty_alias": to_account.alias,
             "description": message,
         }
+
+    async def transfer(self, from_account_id, to_account_id, amount, message):
+        """Transfer funds to one of your own accounts."""
+
+        body = self._build_payment(to_account_id, amount, message)
         str_body = json.dumps(body)
-        signature = self._generate_signature(str_body, self.keys)
+        signature = await self._sign(str_body)
         result = await self._request(
             hdrs.METH_POST,
             f"/v1/user/{self.status.user_id}/monetary-account/{from_account_id}/payment",
@@ -327,14 +697,144 @@ class BunqApi:
             signature=signature,
             data=str_body,
         )
-        LOGGER.debug("transfer response", result)
+        LOGGER.debug("transfer response %s", DebugPayload(result))
+        return result
+
+    async def transfer_batch(self, from_account_id, transfers):
+        """Transfer funds to several of your own accounts in one request.
+
+        transfers is a list of (to_account_id, amount, message). All of them are
+        validated before anything is sent.
+        """
+        from_account = self.status.get_account(from_account_id)
+        if from_account is None:
+            raise BunqApiValidationError(f"source account {from_account_id} not found")
+
+        payments = []
+        for to_account_id, amount, message in transfers:
+            payment = self._build_payment(to_account_id, amount, message)
+            if payment["amount"]["currency"] != from_account.currency:
+                raise BunqApiValidationError(
+                    f"currency of {to_account_id} does not match {from_account_id}"
+                )
+            payments.append(payment)
+
+        str_body = json.dumps({"payments": payments})
+        signature = await self._sign(str_body)
+        result = await self._request(
+            hdrs.METH_POST,
+            f"/v1/user/{self.status.user_id}/monetary-account/{from_account_id}"
+            "/payment-batch",
+            token=self.status.session_token,
+            signature=signature,
+            data=str_body,
+        )
+        LOGGER.debug("transfer batch response %s", DebugPayload(result))
         return result
 
+    def export_context(self) -> dict | None:
+        """Export the installation and session so they can be persisted."""
+        if self.keys is None or self.installation_token is None:
+            return None
+        return {
+            "token": self.token,
+            "private_key": self.keys.export_key(format="PEM").decode("utf-8"),
+            "installation_token": self.installation_token,
+            "user_id": self.status.user_id,
+            "session_token": self.status.session_token,
+            "session_expiry": self.status.session_expiry,
+            "server_public_key": self.server_public_key,
+            "polled_transaction_ids": dict(self.status.polled_transaction_ids),
+        }
+
+    def restore_context(self, context: dict | None) -> None:
+        """Restore a context previously exported with export_context()."""
+        if not context:
+            return
+        if context.get("token") != self.token:
+            LOGGER.debug("stored context belongs to another token, ignoring it")
+            return
+        self.keys = RSA.import_key(context["private_key"])
+        self.installation_token = context["installation_token"]
+        self.server_public_key = context.get("server_public_key")
+        self.status.polled_transaction_ids = dict(
+            context.get("polled_transaction_ids") or {}
+        )
+        self.status.update_user(
+            context["user_id"],
+            context["session_token"],
+            context.get("session_expiry"),
+        )
+        LOGGER.debug("context restored")
+
+    async def _reset_context(self, rejected_session_token):
+        """Drop a rejected session and set up a new one."""
+        if self.status.session_token == rejected_session_token:
+            self.status.update_user(None, None)
+        await self._setup_context()
+
+    def _schedule_session_renewal(self):
+        """Set a timer renewing the session shortly before it expires.
+
+        The timer does not depend on the update interval, so the session is
+        renewed in the background even when no update happens in the margin.
+        """
+        expiry = self.status.session_expiry
+        if expiry is None or expiry == self._session_renewal_expiry:
+            return
+        if self._session_renewal_timer is not None:
+            self._session_renewal_timer.cancel()
+        loop = asyncio.get_running_loop()
+        delay = max(0, expiry - SESSION_RENEW_MARGIN - time.time())
+        self._session_renewal_timer = loop.call_at(
+            loop.time() + delay, self._start_session_renewal
+        )
+        self._session_renewal_expiry = expiry
+
+    def _start_session_renewal(self):
+        self._session_renewal_timer = None
+        if self._session_renewal is None:
+            self._session_renewal = asyncio.create_task(self._renew_session())
+
+    async def _renew_session(self):
+        try:
+            async with self._context_lock:
+                if self.status.session_expires_within(SESSION_RENEW_MARGIN):
+                    LOGGER.debug("session is about to expire, renewing it")
+                    await self._ensure_token(force=True)
+                    await self._create_session()
+        except BunqApiError as error:
+            LOGGER.warning("Could not renew the bunq session: %s", str(error))
+            # the next update sets a new timer, retrying right away
+            self._session_renewal_expiry = None
+        finally:
+            self._session_renewal = None
+
     async def _setup_context(self):
-        if self.status.user_id is not None and self.status.session_token is not None:
+        # concurrent callers wait for a single setup instead of racing
+        async with self._context_lock:
+            await self._setup_context_locked()
+
+    async def _setup_context_locked(self):
+        if (
+            self.status.user_id is not None
+            and self.status.session_token is not None
+            and not self.status.session_expires_within(0)
+        ):
             LOGGER.debug("context already available")
             return
-        self.keys = RSA.generate(2048)
+
+        # checked once, the session and the device registration both use it
+        await self._ensure_token(force=True)
+        if self.keys is not None and self.installation_token is not None:
+            # the device is already registered for this key, a new session is enough
+            try:
+                await self._create_session()
+                return
+            except BunqApiError as error:
+                LOGGER.debug("Could not reuse installation: %s", error)
+
+        self.keys = await self._generate_keys()
         # private_key_client = keys.export_key(format='PEM', passphrase=None, pkcs=8).decode('utf-8')
         public_key_client = (
             self.keys.publickey()
@@ -347,8 +847,9 @@ class BunqApi:
             "/v1/installation",
             json={"client_public_key": public_key_client},
         )
-        LOGGER.debug("installation response: %s", installation)
-        installation_token = self._get_token(installation)
+        LOGGER.debug("installation response: %s", DebugPayload(installation))
+        self.installation_token = self._get_token(installation)
+        self.server_public_key = self._get_server_public_key(installation)
 
         body = {
             "description": "Home Assistant",
@@ -358,22 +859,27 @@ class BunqApi:
             body["permitted_ips"] = ["*"]
             LOGGER.info("Registering device server with wildcard permitted_ips (dynamic IP mode enabled)")
         device_server = await self._request(
-            hdrs.METH_POST, "/v1/device-server", token=installation_token, json=body
+            hdrs.METH_POST, "/v1/device-server", token=self.installation_token, json=body
         )
-        LOGGER.debug("device-server response: %s", device_server)
+        LOGGER.debug("device-server response: %s", DebugPayload(device_server))
+
+        await self._create_session()
 
+    async def _create_session(self):
         body = {"secret": self.token}
         str_body = json.dumps(body)
-        signature = self._generate_signature(str_body, self.keys)
+        signature = await self._sign(str_body)
         session_server = await self._request(
             hdrs.METH_POST,
             "/v1/session-server",
-            token=installation_token,
+            token=self.installation_token,
             signature=signature,
             data=str_body,
         )
 
         user_id = self._get_user_id(session_server)
         session_token = self._get_token(session_server)
-        self.status.update_user(str(user_id), str(session_token))
+        session_expiry = time.time() + self._get_session_timeout(session_server)
+        self.status.update_user(str(user_id), str(session_token), session_expiry)
+        self._schedule_session_renewal()
         LOGGER.debug("context updated")
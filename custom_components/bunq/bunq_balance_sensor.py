@@ -7,66 +7,89 @@ from homeassistant.components.sensor import (
 from homeassistant.core import callback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import LOGGER
+from .const import CONF_TRANSACTIONS_LIMIT, LOGGER, TRANSACTIONS_LIMIT_DEFAULT
+from .models import Account
 
 
 class BunqBalanceSensor(CoordinatorEntity, SensorEntity):
     """Setup bunq balance sensor."""
 
-    def __init__(self, coordinator, account) -> None:
+    # the history is served by the query_transactions service instead
+    _unrecorded_attributes = frozenset({"transactions"})
+
+    def __init__(self, coordinator, account: Account) -> None:
         """Initialize the sensor."""
         super().__init__(coordinator)
-        self._attr_unique_id = str(account["id"])
-        self.object_id = "bunq_" + account["description"].lower().replace(" ", "_")
+        self._attr_unique_id = str(account.id)
+        self.object_id = "bunq_" + account.description.lower().replace(" ", "_")
         self.entity_description = SensorEntityDescription(
-            key=account["id"],
+            key=account.id,
             device_class=SensorDeviceClass.MONETARY,
             icon="mdi:cash-multiple",
-            name=account["description"],
-            unit_of_measurement=account["currency"],
+            name=account.description,
+            unit_of_measurement=account.currency,
         )
         self._attr_extra_state_attributes = {
             "account_id": self._attr_unique_id,
         }
+        self._fingerprint = None
+        self._transactions_limit = coordinator.entry.options.get(
+            CONF_TRANSACTIONS_LIMIT, TRANSACTIONS_LIMIT_DEFAULT
+        )
 
         self._async_update_attrs()
 
+    async def async_added_to_hass(self) -> None:
+        """Register the sensor as the entity of its account."""
+        await super().async_added_to_hass()
+        self.coordinator.account_entities[self._attr_unique_id] = self.entity_id
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Unregister the sensor as the entity of its account."""
+        await super().async_will_remove_from_hass()
+        self.coordinator.account_entities.pop(self._attr_unique_id, None)
+
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self._async_update_attrs()
-        self.async_write_ha_state()
+        if self._async_update_attrs():
+            self.async_write_ha_state()
 
     @callback
-    def _async_update_attrs(self) -> None:
-        """Update sensor attributes."""
-        LOGGER.debug("update attributes for %s", str(self._attr_unique_id))
+    def _async_update_attrs(self) -> bool:
+        """Update sensor attributes, return whether anything changed."""
+        LOGGER.debug("update attributes for %s", self._attr_unique_id)
 
         account = self.coordinator.bunq.status.get_account(self._attr_unique_id)
         if account is None:
-            LOGGER.debug("no account for id %s", str(self._attr_unique_id))
+            LOGGER.debug("no account for id %s", self._attr_unique_id)
+            changed = self._fingerprint is not None
+            self._fingerprint = None
             self._attr_enabled = False
-            return
+            return changed
 
-        transactions = self.coordinator.bunq.status.account_transactions[
-            str(self._attr_unique_id)
-        ]
+        status = self.coordinator.bunq.status
+        transactions = status.account_transactions[str(self._attr_unique_id)]
+        fingerprint = (
+            account.balance,
+            tuple(transaction.id for transaction in transactions),
+            status.stale,
+        )
+        if fingerprint == self._fingerprint:
+            LOGGER.debug("account %s unchanged", self._attr_unique_id)
+            return False
+
+        self._fingerprint = fingerprint
         self._attr_enabled = True
-        self._attr_native_value = float(account["balance"]["value"])
+        self._attr_native_value = float(account.balance)
+        # the balance is the last one fetched while bunq can't be reached
+        self._attr_extra_state_attributes["stale"] = status.stale
         self._load_transactions(transactions)
+        return True
 
     def _load_transactions(self, transactions):
         """Load transactions."""
-        trx = []
-        for transaction in transactions:
-            item = {
-                "amount": float(transaction["amount"]["value"]),
-                "currency": transaction["amount"]["currency"],
-                "description": transaction["description"],
-                "id": transaction["id"],
-                "created": transaction["created"],
-                "type": transaction["type"],
-                "counterparty": transaction["counterparty_alias"]["display_name"],
-            }
-            trx.append(item)
-        self._attr_extra_state_attributes["transactions"] = trx
+        self._attr_extra_state_attributes["transactions"] = [
+            transaction.as_dict()
+            for transaction in transactions[: self._transactions_limit]
+        ]
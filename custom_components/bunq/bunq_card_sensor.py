@@ -8,87 +8,118 @@ from homeassistant.core import callback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import LOGGER
+from .models import Card
 
 
 class BunqCardSensor(CoordinatorEntity, SensorEntity):
     """Setup bunq card sensor."""
 
-    def __init__(self, coordinator, card) -> None:
+    def __init__(self, coordinator, card: Card) -> None:
         """Initialize the sensor."""
         super().__init__(coordinator)
-        self._attr_unique_id = str(card["id"])
-        self.object_id = "card_" + str(card["id"])
+        self._attr_unique_id = str(card.id)
+        self.object_id = "card_" + str(card.id)
         self.entity_description = SensorEntityDescription(
-            key=card["id"],
-            name=card["product_type"].lower().capitalize().replace("_", " ")
+            key=card.id,
+            name=card.product_type.lower().capitalize().replace("_", " ")
             + " "
-            + str(card["id"]),
+            + str(card.id),
             icon="mdi:credit-card",
         )
         self._attr_extra_state_attributes = {
-            "expiry_date": card["expiry_date"],
-            "card_id": str(card["id"]),
+            "expiry_date": card.expiry_date,
+            "card_id": str(card.id),
         }
+        self._fingerprint = None
+        self._account_pending = False
         self._async_update_attrs()
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self._async_update_attrs()
-        self.async_write_ha_state()
+        if self._async_update_attrs():
+            self.async_write_ha_state()
 
     @callback
-    def _async_update_attrs(self) -> None:
-        """Update sensor attributes."""
+    def _async_update_attrs(self) -> bool:
+        """Update sensor attributes, return whether anything changed."""
         card_id = self._attr_extra_state_attributes["card_id"]
         LOGGER.debug("update attributes for %s", card_id)
 
-        card = None
-        for value in self.coordinator.bunq.status.cards:
-            if str(value["id"]) == card_id:
-                card = value
+        status = self.coordinator.bunq.status
+        card = status.get_card(card_id)
 
         if card is None:
             LOGGER.debug("no card for id %s", card_id)
+            changed = self._attr_available is not False
+            self._fingerprint = None
             self._attr_available = False
-            return
+            return changed
 
+        fingerprint = (
+            card.limit,
+            card.limit_atm,
+            card.pin_code_assignment,
+            status.stale,
+        )
+        # an unresolved account entity may be resolvable now, so retry it
+        if fingerprint == self._fingerprint and not self._account_pending:
+            LOGGER.debug("card %s unchanged", card_id)
+            return False
+
+        if fingerprint == self._fingerprint:
+            # only the account entity is retried, write the state once it resolves
+            previous = (
+                self._attr_native_value,
+                self._attr_extra_state_attributes.get("account_entity"),
+            )
+            self._match_account(card)
+            return previous != (
+                self._attr_native_value,
+                self._attr_extra_state_attributes["account_entity"],
+            )
+
+        self._fingerprint = fingerprint
         self._attr_available = True
         self._match_account(card)
-        self._attr_extra_state_attributes["limit"] = card["card_limit"]["value"]
-        self._attr_extra_state_attributes["limit_atm"] = card["card_limit_atm"]["value"]
+        self._attr_extra_state_attributes["limit"] = card.limit
+        self._attr_extra_state_attributes["limit_atm"] = card.limit_atm
+        self._attr_extra_state_attributes["stale"] = status.stale
+        return True
 
-    def _match_account(self, card) -> None:
+    def _match_account(self, card: Card) -> None:
         """Match bunq account id with home assistant entity in state."""
         self._attr_native_value = ""
         self._attr_extra_state_attributes["account_entity"] = ""
+        self._account_pending = False
 
         if self.hass is None:
             LOGGER.debug("home assistant not loaded - can't get entity name")
+            self._account_pending = True
             return
 
-        account_id = ""
-        for pin in card["pin_code_assignment"]:
-            if pin["type"] == "PRIMARY" and pin["status"] == "ACTIVE":
-                account_id = str(pin["monetary_account_id"])
-        LOGGER.debug(
-            "match account %s with card %s",
-            str(account_id),
-            str(card["id"]),
-        )
-        if account_id == "":
+        account_id = card.primary_account_id
+        LOGGER.debug("match account %s with card %s", account_id, card.id)
+        if account_id is None:
             LOGGER.debug("no account linked")
             return
 
-        account_entity = ""
+        account_entity = self.coordinator.account_entities.get(str(account_id), "")
         friendly = ""
-        for e in self.hass.states.async_all():
-            if str(e.attributes.get("account_id")) == account_id:
-                account_entity = e.entity_id
-                friendly = e.attributes.get("friendly_name") or e.attributes.get("name")
+        state = self.hass.states.get(account_entity) if account_entity else None
+        if state is not None:
+            friendly = state.attributes.get("friendly_name") or state.attributes.get(
+                "name"
+            )
+        else:
+            account_entity = ""
 
         if account_entity == "":
             LOGGER.debug("account %s not found in home assistant", account_id)
+            # retry only while a balance sensor is expected for the account
+            self._account_pending = (
+                self.coordinator.bunq.status.get_account(account_id) is not None
+            )
 
         self._attr_native_value = friendly
         self._attr_extra_state_attributes["account_entity"] = account_entity
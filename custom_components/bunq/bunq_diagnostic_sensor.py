@@ -0,0 +1,82 @@
+""" bunq diagnostic sensors"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .metrics import BunqApiMetrics
+
+
+@dataclass(frozen=True, kw_only=True)
+class BunqDiagnosticSensorEntityDescription(SensorEntityDescription):
+    """Describe a bunq diagnostic sensor."""
+
+    value_fn: Callable[[BunqApiMetrics], float | int | None]
+
+
+DIAGNOSTIC_SENSORS = (
+    BunqDiagnosticSensorEntityDescription(
+        key="refresh_duration",
+        name="bunq refresh duration",
+        icon="mdi:timer-outline",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=2,
+        value_fn=lambda metrics: metrics.last_refresh_duration,
+    ),
+    BunqDiagnosticSensorEntityDescription(
+        key="api_calls_per_hour",
+        name="bunq API calls per hour",
+        icon="mdi:api",
+        native_unit_of_measurement="calls/h",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: metrics.requests_last_hour,
+    ),
+    BunqDiagnosticSensorEntityDescription(
+        key="rate_limit_hits",
+        name="bunq rate limit hits",
+        icon="mdi:speedometer",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: metrics.rate_limited,
+    ),
+)
+
+
+class BunqDiagnosticSensor(CoordinatorEntity, SensorEntity):
+    """Setup bunq diagnostic sensor, disabled by default."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self, coordinator, description: BunqDiagnosticSensorEntityDescription
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_unique_id = f"{coordinator.entry.entry_id}_{description.key}"
+        self._async_update_attrs()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        self._async_update_attrs()
+        self.async_write_ha_state()
+
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Update sensor attributes."""
+        self._attr_native_value = self.entity_description.value_fn(
+            self.coordinator.bunq.metrics
+        )
@@ -0,0 +1,55 @@
+""" Circuit breaker for the bunq api """
+
+import time
+
+from .const import LOGGER
+from .exceptions import BunqApiCircuitOpenError
+
+
+class CircuitBreaker:
+    """Stop calling the api for a while after repeated failures."""
+
+    def __init__(self, threshold: int, reset_timeout: float) -> None:
+        """Initialize a closed circuit."""
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        """Return whether requests are currently short-circuited."""
+        return (
+            self._opened_at is not None
+            and time.monotonic() - self._opened_at < self.reset_timeout
+        )
+
+    def check(self) -> None:
+        """Raise when the circuit is open.
+
+        Once the reset timeout passed, requests go through again; a single
+        failure then opens the circuit again.
+        """
+        if self.is_open:
+            raise BunqApiCircuitOpenError(
+                "Requests to the Bunq API are suspended after repeated failures"
+            )
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        if self._opened_at is not None:
+            LOGGER.info("Bunq API reachable again")
+        self.failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit when the threshold is reached."""
+        self.failures += 1
+        if self.failures >= self.threshold:
+            if not self.is_open:
+                LOGGER.warning(
+                    "Bunq API failed %d times, suspending requests for %ds",
+                    self.failures,
+                    self.reset_timeout,
+                )
+            self._opened_at = time.monotonic()
@@ -13,7 +13,24 @@ from homeassistant.helpers.config_entry_oauth2_flow import \
     AbstractOAuth2FlowHandler
 
 from .bunq_api import BunqApi
-from .const import CONF_ALLOW_DYNAMIC_IP, DOMAIN, ENVIRONMENT, LOGGER
+from .const import (
+    CARDS_INTERVAL_DEFAULT,
+    CONF_ALLOW_DYNAMIC_IP,
+    CONF_CARDS_INTERVAL,
+    CONF_PUSH,
+    CONF_TRANSACTIONS_INTERVAL,
+    CONF_UPDATE_INTERVAL_MAX,
+    CONF_UPDATE_INTERVAL_MIN,
+    CONF_TRANSACTIONS_LIMIT,
+    DOMAIN,
+    ENVIRONMENT,
+    LOGGER,
+    TRANSACTIONS_INTERVAL_DEFAULT,
+    TRANSACTIONS_LIMIT_DEFAULT,
+    TRANSACTIONS_PAGE_SIZE,
+    UPDATE_INTERVAL,
+    UPDATE_INTERVAL_MAX_DEFAULT,
+)
 
 
 class BunqFlowHandler(AbstractOAuth2FlowHandler, domain=DOMAIN):
@@ -57,16 +74,20 @@ class BunqFlowHandler(AbstractOAuth2FlowHandler, domain=DOMAIN):
             return self.async_abort(reason="oauth_error")
 
         LOGGER.debug("async_oauth_create_entry: creating BunqApi and calling update()")
+        api = BunqApi(
+            environment=ENVIRONMENT,
+            token=token["access_token"],
+            session=async_get_clientsession(self.hass),
+        )
         try:
-            api = BunqApi(
-                environment=ENVIRONMENT,
-                token=token["access_token"],
-                session=async_get_clientsession(self.hass),
-            )
-            status = await api.update()
+            await api.update()
         except Exception as err:
             LOGGER.error("async_oauth_create_entry: BunqApi.update() failed: %s", err, exc_info=True)
             return self.async_abort(reason="oauth_error")
+        finally:
+            # the api was only needed to identify the user
+            await api.close()
+        status = api.status
 
         LOGGER.debug(
             "async_oauth_create_entry: update() result: user_id=%s, session_token_present=%s",
@@ -102,9 +123,16 @@ class BunqOptionsFlowHandler(OptionsFlow):
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Manage bunq options."""
+        errors = {}
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
-
+            if user_input.get(
+                CONF_UPDATE_INTERVAL_MIN, UPDATE_INTERVAL.total_seconds()
+            ) > user_input.get(CONF_UPDATE_INTERVAL_MAX, UPDATE_INTERVAL_MAX_DEFAULT):
+                errors["base"] = "invalid_update_interval"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
         return self.async_show_form(
             step_id="init",
             data_schema=vol.Schema(
@@ -115,6 +143,41 @@ class BunqOptionsFlowHandler(OptionsFlow):
                             CONF_ALLOW_DYNAMIC_IP, False
                         ),
                     ): bool,
+                    vol.Optional(
+                        CONF_PUSH,
+                        default=self.config_entry.options.get(CONF_PUSH, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_TRANSACTIONS_LIMIT,
+                        default=self.config_entry.options.get(
+                            CONF_TRANSACTIONS_LIMIT, TRANSACTIONS_LIMIT_DEFAULT
+                        ),
+                    ): vol.All(
+                        vol.Coerce(int), vol.Range(min=0, max=TRANSACTIONS_PAGE_SIZE)
+                    ),
+                    vol.Optional(
+                        CONF_UPDATE_INTERVAL_MIN,
+                        default=options.get(
+                            CONF_UPDATE_INTERVAL_MIN, UPDATE_INTERVAL.total_seconds()
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=10)),
+                    vol.Optional(
+                        CONF_UPDATE_INTERVAL_MAX,
+                        default=options.get(
+                            CONF_UPDATE_INTERVAL_MAX, UPDATE_INTERVAL_MAX_DEFAULT
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=10)),
+                    vol.Optional(
+                        CONF_TRANSACTIONS_INTERVAL,
+                        default=options.get(
+                            CONF_TRANSACTIONS_INTERVAL, TRANSACTIONS_INTERVAL_DEFAULT
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                    vol.Optional(
+                        CONF_CARDS_INTERVAL,
+                        default=options.get(CONF_CARDS_INTERVAL, CARDS_INTERVAL_DEFAULT),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1)),
                 }
             ),
+            errors=errors,
         )
@@ -10,6 +10,53 @@ from .models import BunqApiEnvironment, BunqApiUrls
 DOMAIN: Final = "bunq"
 
 UPDATE_INTERVAL = timedelta(seconds=55)
+# without activity the update interval grows by this factor up to the maximum
+UPDATE_INTERVAL_BACKOFF = 2
+UPDATE_INTERVAL_MAX_DEFAULT = 300
+# all accounts are checked for new transactions at least this often (in minutes)
+TRANSACTIONS_INTERVAL_DEFAULT = 5
+CARDS_INTERVAL_DEFAULT = 60
+# in push mode polling only reconciles missed notifications
+PUSH_UPDATE_INTERVAL = timedelta(minutes=15)
+PUSH_CATEGORIES = ["MUTATION", "PAYMENT"]
+
+# bunq sessions expire after one week unless configured otherwise (in seconds)
+SESSION_TIMEOUT_DEFAULT = 7 * 24 * 3600
+# renew the session this many seconds before it expires
+SESSION_RENEW_MARGIN = 10 * 60
+
+# re-validate the oauth token at most this often (in seconds)
+TOKEN_CHECK_INTERVAL = 3600
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.context"
+TRANSACTIONS_DATABASE = f"{DOMAIN}.{{entry_id}}.db"
+
+MAX_CONCURRENT_REQUESTS = 4
+
+# idempotent requests are tried this many times on transient errors
+RETRY_ATTEMPTS = 3
+# base delay in seconds of the exponential backoff between attempts
+RETRY_BACKOFF = 1
+# consecutive failed requests before requests are suspended
+CIRCUIT_BREAKER_THRESHOLD = 5
+# seconds requests stay suspended
+CIRCUIT_BREAKER_TIMEOUT = 300
+
+# largest page bunq returns for a listing
+PAGE_SIZE_MAX = 200
+
+# number of payments requested and kept per account
+TRANSACTIONS_PAGE_SIZE = 50
+# default number of payments exposed in the transactions attribute
+TRANSACTIONS_LIMIT_DEFAULT = 10
+
+# bunq allows this many requests per method per period (in seconds)
+RATE_LIMITS = {
+    "GET": (3, 3),
+    "POST": (5, 3),
+    "PUT": (2, 3),
+}
 
 ENVIRONMENT_URLS = {
     BunqApiEnvironment.Sandbox: BunqApiUrls(
@@ -25,6 +72,10 @@ ENVIRONMENT_URLS = {
 }
 
 LOGGER = logging.getLogger(__package__)
+# payloads logged at debug level are cut after this many characters
+DEBUG_PAYLOAD_MAX_LENGTH = 2000
+
+EVENT_TRANSACTION: Final = f"{DOMAIN}_transaction"
 
 ENVIRONMENT = BunqApiEnvironment.Production
 
@@ -36,5 +87,20 @@ ATTR_TO_ACCOUNT_ENTITY = "to_account_entity"
 ATTR_ACCOUNT_ENTITY = "account_entity"
 ATTR_CARD_ENTITY = "card_entity"
 ATTR_MESSAGE = "message"
+ATTR_TRANSFERS = "transfers"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_MIN_AMOUNT = "min_amount"
+ATTR_MAX_AMOUNT = "max_amount"
+ATTR_COUNTERPARTY = "counterparty"
+ATTR_DESCRIPTION = "description"
+ATTR_LIMIT = "limit"
+ATTR_OFFSET = "offset"
 
 CONF_ALLOW_DYNAMIC_IP: Final = "allow_dynamic_ip"
+CONF_TRANSACTIONS_LIMIT: Final = "transactions_limit"
+CONF_PUSH: Final = "push"
+CONF_UPDATE_INTERVAL_MIN: Final = "update_interval_min"
+CONF_UPDATE_INTERVAL_MAX: Final = "update_interval_max"
+CONF_TRANSACTIONS_INTERVAL: Final = "transactions_interval"
+CONF_CARDS_INTERVAL: Final = "cards_interval"
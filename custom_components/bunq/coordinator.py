@@ -1,17 +1,54 @@
 """Provides the Bunq DataUpdateCoordinator."""
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import json
+import time
+from collections import defaultdict
+from datetime import timedelta
+from http import HTTPStatus
+
+from aiohttp import web
+from homeassistant.components import webhook
+from homeassistant.components.sensor import SensorDeviceClass
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.config_entry_oauth2_flow import OAuth2Session
+from homeassistant.helpers.network import NoURLAvailableError
+from homeassistant.helpers.storage import STORAGE_DIR, Store
 from homeassistant.helpers.update_coordinator import (DataUpdateCoordinator,
                                                       UpdateFailed)
 
 from .bunq_api import BunqApi
-from .const import CONF_ALLOW_DYNAMIC_IP, DOMAIN, ENVIRONMENT, LOGGER, UPDATE_INTERVAL
-from .exceptions import BunqApiError
+from .const import (
+    CARDS_INTERVAL_DEFAULT,
+    CONF_ALLOW_DYNAMIC_IP,
+    CONF_CARDS_INTERVAL,
+    CONF_PUSH,
+    CONF_TRANSACTIONS_INTERVAL,
+    CONF_UPDATE_INTERVAL_MAX,
+    CONF_UPDATE_INTERVAL_MIN,
+    DOMAIN,
+    ENVIRONMENT,
+    EVENT_TRANSACTION,
+    LOGGER,
+    PUSH_CATEGORIES,
+    PUSH_UPDATE_INTERVAL,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+    TRANSACTIONS_DATABASE,
+    TRANSACTIONS_INTERVAL_DEFAULT,
+    TRANSACTIONS_PAGE_SIZE,
+    UPDATE_INTERVAL,
+    UPDATE_INTERVAL_BACKOFF,
+    UPDATE_INTERVAL_MAX_DEFAULT,
+)
+from .exceptions import BunqApiConnectionError, BunqApiError
 from .models import BunqStatus
+from .transaction_store import BunqTransactionStore
 
 
 class BunqDataUpdateCoordinator(DataUpdateCoordinator):
@@ -23,11 +60,24 @@ class BunqDataUpdateCoordinator(DataUpdateCoordinator):
         """Initialize global Bunq data updater."""
         self.session = session
         self.entry = entry
+        self.store = Store(hass, STORAGE_VERSION, f"{STORAGE_KEY}.{entry.entry_id}")
+        self._stored_context = None
+        self._context_loaded = False
+        # bunq account id -> entity id of its balance sensor
+        self.account_entities: dict[str, str] = {}
+        self.transactions = BunqTransactionStore(
+            hass.config.path(
+                STORAGE_DIR, TRANSACTIONS_DATABASE.format(entry_id=entry.entry_id)
+            )
+        )
+        self._backfill_task: asyncio.Task | None = None
+        # accounts whose full history is in the local store
+        self._backfilled_account_ids: set = set()
+        self._webhook_id: str | None = None
 
         async def async_token_refresh() -> str:
             await session.async_ensure_token_valid()
             token = session.token["access_token"]
-            LOGGER.debug(str(token))
             return str(token)
 
         allow_dynamic_ip = entry.options.get(CONF_ALLOW_DYNAMIC_IP, False)
@@ -41,10 +91,264 @@ class BunqDataUpdateCoordinator(DataUpdateCoordinator):
             allow_dynamic_ip=allow_dynamic_ip,
         )
 
-        super().__init__(hass, LOGGER, name=DOMAIN, update_interval=UPDATE_INTERVAL)
+        self._interval_min = timedelta(
+            seconds=entry.options.get(
+                CONF_UPDATE_INTERVAL_MIN, UPDATE_INTERVAL.total_seconds()
+            )
+        )
+        self._interval_max = timedelta(
+            seconds=entry.options.get(
+                CONF_UPDATE_INTERVAL_MAX, UPDATE_INTERVAL_MAX_DEFAULT
+            )
+        )
+        if entry.options.get(CONF_PUSH, False):
+            # notifications signal the activity, polling only reconciles
+            self._interval_min = self._interval_max = PUSH_UPDATE_INTERVAL
+        self._transactions_interval = timedelta(
+            minutes=entry.options.get(
+                CONF_TRANSACTIONS_INTERVAL, TRANSACTIONS_INTERVAL_DEFAULT
+            )
+        ).total_seconds()
+        self._cards_interval = timedelta(
+            minutes=entry.options.get(CONF_CARDS_INTERVAL, CARDS_INTERVAL_DEFAULT)
+        ).total_seconds()
+        self._next_transactions_update = 0.0
+        self._next_cards_update = 0.0
+
+        super().__init__(
+            hass, LOGGER, name=DOMAIN, update_interval=self._interval_min
+        )
+
+    @callback
+    def async_load_account_entities(self) -> None:
+        """Index the balance sensors of this entry already in the entity registry."""
+        registry = er.async_get(self.hass)
+        for entity in er.async_entries_for_config_entry(registry, self.entry.entry_id):
+            if entity.original_device_class == SensorDeviceClass.MONETARY:
+                self.account_entities[entity.unique_id] = entity.entity_id
 
     async def _async_update_data(self) -> BunqStatus:
+        if not self._context_loaded:
+            self._stored_context = await self.store.async_load()
+            self.bunq.restore_context(self._stored_context)
+            if self.bunq.keys is None:
+                # generate the key pair while the token is being validated
+                self.bunq.prepare_keys()
+            # the newest stored transaction is where fetching resumes, so
+            # payments received while stopped are stored as well
+            recent = await self.hass.async_add_executor_job(
+                self.transactions.get_recent_transactions, TRANSACTIONS_PAGE_SIZE
+            )
+            for account_id, transactions in recent.items():
+                self.bunq.status.update_account_transactions(account_id, transactions)
+            self._context_loaded = True
+
+        now = time.monotonic()
+        all_transactions = now >= self._next_transactions_update
+        cards = now >= self._next_cards_update
         try:
-            return await self.bunq.update()
+            update = await self.bunq.update(
+                all_transactions=all_transactions, cards=cards
+            )
+        except BunqApiConnectionError as error:
+            if self.data is None:
+                raise UpdateFailed(f"Could not reach the API: {error}") from error
+            LOGGER.warning("Could not reach the bunq API, keeping last data: %s", error)
+            self.bunq.status.stale = True
+            self._adapt_update_interval(False)
+            return self.bunq.status
         except BunqApiError as error:
             raise UpdateFailed(f"Invalid response from API: {error}") from error
+        status = self.bunq.status
+        status.stale = False
+
+        if all_transactions:
+            self._next_transactions_update = now + self._transactions_interval
+        if cards:
+            self._next_cards_update = now + self._cards_interval
+        self._adapt_update_interval(
+            len(update.changed_account_ids) > 0 or len(update.new_transactions) > 0
+        )
+
+        await self._async_save_context()
+        self._fire_transaction_events(update.new_transactions)
+        await self._async_store_transactions(update.fetched_transactions)
+        # new accounts and failed backfills are picked up by a later update
+        if (self._backfill_task is None or self._backfill_task.done()) and any(
+            account.id not in self._backfilled_account_ids
+            for account in status.accounts
+        ):
+            self._backfill_task = self.entry.async_create_background_task(
+                self.hass, self._async_backfill(), f"{DOMAIN} transaction backfill"
+            )
+        return status
+
+    @callback
+    def _fire_transaction_events(self, new_transactions) -> None:
+        """Fire an event for each transaction that appeared during an update."""
+        for account_id, transaction in new_transactions:
+            self.hass.bus.async_fire(
+                EVENT_TRANSACTION,
+                {
+                    "account_id": str(account_id),
+                    "account_entity": self.account_entities.get(str(account_id)),
+                    **transaction.as_dict(),
+                },
+            )
+
+    async def _async_store_transactions(self, transactions) -> None:
+        """Add the transactions fetched during an update to the local store."""
+        by_account = defaultdict(list)
+        for account_id, transaction in transactions:
+            by_account[account_id].append(transaction)
+        for account_id, items in by_account.items():
+            await self.hass.async_add_executor_job(
+                self.transactions.add_transactions, account_id, items
+            )
+
+    async def _async_backfill(self) -> None:
+        """Store the transaction history of accounts once."""
+        for account in list(self.bunq.status.accounts):
+            account_id = account.id
+            if account_id in self._backfilled_account_ids:
+                continue
+            if await self.hass.async_add_executor_job(
+                self.transactions.is_backfilled, account_id
+            ):
+                self._backfilled_account_ids.add(account_id)
+                continue
+            # resume from the oldest stored transaction after an interruption
+            older_id = await self.hass.async_add_executor_job(
+                self.transactions.get_oldest_transaction_id, account_id
+            )
+            LOGGER.debug("backfill transactions of account %s", account_id)
+            try:
+                async for page in self.bunq.iterate_account_transactions(
+                    account_id, older_id=older_id
+                ):
+                    await self.hass.async_add_executor_job(
+                        self.transactions.add_transactions, account_id, page
+                    )
+            except BunqApiError as error:
+                LOGGER.warning(
+                    "Could not backfill transactions of account %s: %s",
+                    account_id,
+                    error,
+                )
+                continue
+            await self.hass.async_add_executor_job(
+                self.transactions.set_backfilled, account_id
+            )
+            self._backfilled_account_ids.add(account_id)
+
+    async def async_enable_push(self) -> None:
+        """Have bunq push payments to a webhook."""
+        webhook_id = webhook.async_generate_id()
+        webhook.async_register(
+            self.hass,
+            DOMAIN,
+            "bunq",
+            webhook_id,
+            self._async_handle_webhook,
+            local_only=False,
+        )
+        self._webhook_id = webhook_id
+        try:
+            url = webhook.async_generate_url(
+                self.hass, webhook_id, allow_internal=False, prefer_external=True
+            )
+        except NoURLAvailableError:
+            LOGGER.warning("Push disabled: no external url configured in Home Assistant")
+            return
+        try:
+            await self.bunq.ensure_server_public_key()
+            await self._async_save_context()
+            await self.bunq.update_notification_filters(url, PUSH_CATEGORIES)
+        except BunqApiError as error:
+            LOGGER.warning("Could not register the bunq callbacks: %s", error)
+            return
+        LOGGER.debug("bunq callbacks registered")
+
+    async def async_disable_push(self) -> None:
+        """Stop the payments pushed to the webhook."""
+        if self._webhook_id is None:
+            return
+        webhook.async_unregister(self.hass, self._webhook_id)
+        self._webhook_id = None
+        try:
+            await self.bunq.update_notification_filters(None, [])
+        except BunqApiError as error:
+            LOGGER.warning("Could not remove the bunq callbacks: %s", error)
+
+    async def _async_handle_webhook(
+        self, hass: HomeAssistant, webhook_id: str, request: web.Request
+    ) -> web.Response:
+        """Apply a notification pushed by bunq."""
+        body = await request.read()
+        if not self.bunq.verify_server_signature(
+            body, request.headers.get("X-Bunq-Server-Signature")
+        ):
+            LOGGER.warning("Ignoring bunq callback with an invalid signature")
+            return web.Response(status=HTTPStatus.UNAUTHORIZED)
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return web.Response(status=HTTPStatus.BAD_REQUEST)
+
+        update = self.bunq.apply_notification(data)
+        if update is not None:
+            self._fire_transaction_events(update.new_transactions)
+            self.async_set_updated_data(self.bunq.status)
+            await self._async_store_transactions(update.fetched_transactions)
+        return web.Response(status=HTTPStatus.OK)
+
+    async def async_close(self) -> None:
+        """Release the resources of the coordinator."""
+        await self.async_disable_push()
+        if self._backfill_task is not None:
+            # the store must not be used once it is closed
+            self._backfill_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._backfill_task
+        await self.bunq.close()
+        await self.hass.async_add_executor_job(self.transactions.close)
+
+    def _adapt_update_interval(self, active: bool) -> None:
+        """Poll fast after activity and back off while idle."""
+        if active:
+            interval = self._interval_min
+        else:
+            interval = min(
+                self.update_interval * UPDATE_INTERVAL_BACKOFF, self._interval_max
+            )
+        if interval != self.update_interval:
+            LOGGER.debug("update interval set to %s", interval)
+            self.update_interval = interval
+
+    async def async_refresh_accounts(self, account_ids) -> None:
+        """Refresh some accounts right away and push them to the entities."""
+        try:
+            update = await self.bunq.refresh_accounts(account_ids)
+        except BunqApiError as error:
+            LOGGER.warning("Could not refresh accounts %s: %s", account_ids, error)
+            return
+        self._fire_transaction_events(update.new_transactions)
+        self.async_set_updated_data(self.bunq.status)
+        await self._async_store_transactions(update.fetched_transactions)
+
+    async def async_refresh_card(self, card_id) -> None:
+        """Refresh a card right away and push it to the entities."""
+        try:
+            await self.bunq.refresh_card(card_id)
+        except BunqApiError as error:
+            LOGGER.warning("Could not refresh card %s: %s", card_id, error)
+            return
+        self.async_set_updated_data(self.bunq.status)
+
+    async def _async_save_context(self) -> None:
+        """Persist the bunq context when it changed."""
+        context = self.bunq.export_context()
+        if context is not None and context != self._stored_context:
+            await self.store.async_save(context)
+            self._stored_context = context
+            LOGGER.debug("context stored")
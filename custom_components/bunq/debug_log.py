@@ -0,0 +1,61 @@
+""" Lazily rendered payloads for debug logging """
+from __future__ import annotations
+
+import json
+
+from .const import DEBUG_PAYLOAD_MAX_LENGTH
+
+REDACTED = "**REDACTED**"
+# payload fields and headers holding secrets
+SECRET_KEYS = {
+    "secret",
+    "token",
+    "client_public_key",
+    "server_public_key",
+    "X-Bunq-Client-Authentication",
+    "X-Bunq-Client-Signature",
+}
+
+
+def redact(value):
+    """Return a copy of a json value with the secrets replaced."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key in SECRET_KEYS and item else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+class DebugPayload:
+    """Render a payload only when the log record is actually emitted.
+
+    Use it as a logging argument: LOGGER.debug("response: %s", DebugPayload(data)).
+    The payload is redacted and truncated to DEBUG_PAYLOAD_MAX_LENGTH characters.
+    """
+
+    __slots__ = ("_payload",)
+
+    def __init__(self, payload) -> None:
+        """Keep a reference to the payload, nothing is rendered yet."""
+        self._payload = payload
+
+    def __str__(self) -> str:
+        """Render the redacted and truncated payload."""
+        payload = self._payload
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf8", errors="replace")
+        if isinstance(payload, str):
+            try:
+                payload = json.loads(payload)
+            except ValueError:
+                return _truncate(payload)
+        return _truncate(json.dumps(redact(payload), default=str))
+
+
+def _truncate(text: str) -> str:
+    if len(text) <= DEBUG_PAYLOAD_MAX_LENGTH:
+        return text
+    return f"{text[:DEBUG_PAYLOAD_MAX_LENGTH]}... ({len(text)} characters)"
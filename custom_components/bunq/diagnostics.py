@@ -0,0 +1,40 @@
+"""Diagnostics support for bunq."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import BunqDataUpdateCoordinator
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: BunqDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    bunq = coordinator.bunq
+    return {
+        "options": dict(entry.options),
+        "update_interval": str(coordinator.update_interval),
+        "status": {
+            "accounts": len(bunq.status.accounts),
+            "cards": len(bunq.status.cards),
+            "transactions": sum(
+                len(transactions)
+                for transactions in bunq.status.account_transactions.values()
+            ),
+            "stale": bunq.status.stale,
+        },
+        "rate_limiter": {
+            "delayed_requests": bunq.rate_limiter.delayed_requests,
+            "total_wait": bunq.rate_limiter.total_wait,
+        },
+        "circuit_breaker": {
+            "open": bunq.circuit_breaker.is_open,
+            "failures": bunq.circuit_breaker.failures,
+        },
+        "metrics": bunq.metrics.as_dict(),
+    }
@@ -18,6 +18,14 @@ class BunqApiError(Exception):
         return dumps(self.args[0])
 
 
+class BunqApiValidationError(BunqApiError):
+    """BunqApi exception for invalid input, raised before calling bunq."""
+
+    def get_message(self):
+        """get the validation message"""
+        return self.args[0]
+
+
 class BunqApiConnectionError(BunqApiError):
     """BunqApi connection exception."""
 
@@ -28,3 +36,7 @@ class BunqApiConnectionTimeoutError(BunqApiConnectionError):
 
 class BunqApiRateLimitError(BunqApiConnectionError):
     """BunqApi Rate Limit exception."""
+
+
+class BunqApiCircuitOpenError(BunqApiConnectionError):
+    """BunqApi exception raised while requests are suspended."""
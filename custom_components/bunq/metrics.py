@@ -0,0 +1,115 @@
+""" Request metrics of the bunq api """
+
+import re
+import time
+from collections import deque
+
+from .exceptions import BunqApiError, BunqApiRateLimitError
+
+# upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+
+class EndpointMetrics:
+    """Counters of a single endpoint."""
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.bytes_received = 0
+        self.latency_total = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dict."""
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "bytes_received": self.bytes_received,
+            "latency_average": (
+                self.latency_total / self.requests if self.requests else None
+            ),
+            "latency_histogram": {
+                f"le_{bound}": count
+                for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets)
+            },
+        }
+
+
+class BunqApiMetrics:
+    """Collect request metrics per endpoint."""
+
+    def __init__(self) -> None:
+        """Initialize empty metrics."""
+        self.endpoints: dict[str, EndpointMetrics] = {}
+        self.last_refresh_duration: float | None = None
+        self._request_times = deque()
+
+    def _endpoint(self, method, uri) -> EndpointMetrics:
+        # ids and query strings are left out to group the calls by endpoint
+        key = f"{method} {re.sub(r'/[0-9]+', '/{id}', uri.split('?')[0])}"
+        if key not in self.endpoints:
+            self.endpoints[key] = EndpointMetrics()
+        return self.endpoints[key]
+
+    def record_request(self, method, uri, duration, error: BunqApiError | None):
+        """Record a request and its outcome."""
+        endpoint = self._endpoint(method, uri)
+        endpoint.requests += 1
+        endpoint.latency_total += duration
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                endpoint.latency_buckets[index] += 1
+                break
+        if error is not None:
+            endpoint.errors += 1
+        if isinstance(error, BunqApiRateLimitError):
+            endpoint.rate_limited += 1
+        now = time.monotonic()
+        self._request_times.append(now)
+        self._prune_request_times(now)
+
+    def record_bytes(self, method, uri, size):
+        """Record the size of a response body."""
+        self._endpoint(method, uri).bytes_received += size
+
+    def record_retry(self, method, uri):
+        """Record a retried request."""
+        self._endpoint(method, uri).retries += 1
+
+    def record_refresh(self, duration):
+        """Record the duration of a full refresh."""
+        self.last_refresh_duration = duration
+
+    def _prune_request_times(self, now) -> None:
+        # only the last hour is reported, so older requests are dropped
+        limit = now - 3600
+        while self._request_times and self._request_times[0] < limit:
+            self._request_times.popleft()
+
+    @property
+    def requests_last_hour(self) -> int:
+        """Return the number of requests sent during the last hour."""
+        self._prune_request_times(time.monotonic())
+        return len(self._request_times)
+
+    @property
+    def rate_limited(self) -> int:
+        """Return the number of 429 responses."""
+        return sum(endpoint.rate_limited for endpoint in self.endpoints.values())
+
+    def as_dict(self) -> dict:
+        """Return all metrics as a dict."""
+        return {
+            "last_refresh_duration": self.last_refresh_duration,
+            "requests_last_hour": self.requests_last_hour,
+            "rate_limited": self.rate_limited,
+            "endpoints": {
+                key: endpoint.as_dict() for key, endpoint in self.endpoints.items()
+            },
+        }
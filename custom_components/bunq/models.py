@@ -1,4 +1,8 @@
 """ bunq models """
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import TypedDict
 
@@ -18,40 +22,260 @@ class BunqApiEnvironment(Enum):
     Production = (2,)
 
 
+@dataclass(slots=True)
+class Account:
+    """A monetary account, with the fields used by the integration."""
+
+    id: int
+    description: str
+    currency: str
+    # as sent by bunq, e.g. "12.50"
+    balance: str
+    # the first alias, counterparty of transfers to this account
+    alias: dict | None
+
+    @classmethod
+    def from_json(cls, data) -> Account:
+        """Parse a bunq monetary account."""
+        aliases = data.get("alias") or []
+        return cls(
+            id=data["id"],
+            description=data["description"],
+            currency=data["currency"],
+            balance=data["balance"]["value"],
+            alias=aliases[0] if aliases else None,
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class PinAssignment:
+    """The account a card pays from."""
+
+    type: str
+    status: str
+    monetary_account_id: int | None
+    routing_type: str | None = None
+
+    @classmethod
+    def from_json(cls, data) -> PinAssignment:
+        """Parse a bunq pin code assignment."""
+        return cls(
+            type=data["type"],
+            status=data["status"],
+            monetary_account_id=data.get("monetary_account_id"),
+            routing_type=data.get("routing_type"),
+        )
+
+    def as_json(self) -> dict:
+        """Get the assignment as sent to bunq when a card is updated."""
+        data = {"type": self.type, "monetary_account_id": self.monetary_account_id}
+        if self.routing_type is not None:
+            data["routing_type"] = self.routing_type
+        return data
+
+
+@dataclass(slots=True)
+class Card:
+    """A card, with the fields used by the integration."""
+
+    id: int
+    product_type: str
+    expiry_date: str
+    limit: str | None
+    limit_atm: str | None
+    pin_code_assignment: tuple[PinAssignment, ...]
+
+    @classmethod
+    def from_json(cls, data) -> Card:
+        """Parse a bunq card."""
+        return cls(
+            id=data["id"],
+            product_type=data["product_type"],
+            expiry_date=data["expiry_date"],
+            limit=(data.get("card_limit") or {}).get("value"),
+            limit_atm=(data.get("card_limit_atm") or {}).get("value"),
+            pin_code_assignment=tuple(
+                PinAssignment.from_json(pin)
+                for pin in data.get("pin_code_assignment") or []
+            ),
+        )
+
+    @property
+    def primary_account_id(self) -> int | None:
+        """Get the id of the account the card pays from."""
+        account_id = None
+        for pin in self.pin_code_assignment:
+            if pin.type == "PRIMARY" and pin.status == "ACTIVE":
+                account_id = pin.monetary_account_id
+        return account_id
+
+
+@dataclass(slots=True, frozen=True)
+class Payment:
+    """A payment, with the fields exposed by the integration."""
+
+    id: int
+    created: str
+    amount: float
+    currency: str
+    description: str
+    type: str
+    counterparty: str
+
+    @classmethod
+    def from_json(cls, data) -> Payment:
+        """Parse a bunq payment."""
+        return cls(
+            id=data["id"],
+            created=data["created"],
+            amount=float(data["amount"]["value"]),
+            currency=data["amount"]["currency"],
+            description=data["description"],
+            type=data["type"],
+            counterparty=data["counterparty_alias"]["display_name"],
+        )
+
+    def as_dict(self) -> dict:
+        """Get the payment as exposed in attributes, events and services."""
+        return {
+            "amount": self.amount,
+            "currency": self.currency,
+            "description": self.description,
+            "id": self.id,
+            "created": self.created,
+            "type": self.type,
+            "counterparty": self.counterparty,
+        }
+
+
+@dataclass(slots=True)
+class BunqUpdate:
+    """The changes brought by one update of the status."""
+
+    # accounts whose balance changed
+    changed_account_ids: list = field(default_factory=list)
+    # (account id, payment) pairs that were not known before
+    new_transactions: list[tuple[int, Payment]] = field(default_factory=list)
+    # (account id, payment) pairs received from bunq, including the known ones
+    # and the ones beyond the transactions kept in memory
+    fetched_transactions: list[tuple[int, Payment]] = field(default_factory=list)
+
+
 class BunqStatus:
     """Class to hold all bunq information"""
 
-    user_id: str = None
-    session_token: str = None
-    accounts: list = []
-    cards: list = []
-    account_transactions: dict = {}
+    def __init__(self) -> None:
+        """Initialize an empty status."""
+        self.user_id: str = None
+        self.session_token: str = None
+        self.session_expiry: float = None
+        self.accounts: list[Account] = []
+        self.cards: list[Card] = []
+        self.account_transactions: dict[str, list[Payment]] = {}
+        # per account, the newest transaction id polling has seen; pushed
+        # transactions do not count, so polling still finds the missed ones
+        self.polled_transaction_ids: dict[str, int] = {}
+        # set while the data could not be refreshed
+        self.stale = False
+        # indexes by id (as string), rebuilt whenever the data is updated
+        self._accounts_by_id: dict = {}
+        self._cards_by_id: dict = {}
+        self._transactions_by_id: dict = {}
 
-    def update_user(self, user_id, session_token):
+    def update_user(self, user_id, session_token, session_expiry=None):
         """Store user info."""
         self.user_id = user_id
         self.session_token = session_token
+        self.session_expiry = session_expiry
+
+    def session_expires_within(self, seconds):
+        """Check if the session expires in the given number of seconds."""
+        if self.session_expiry is None:
+            return False
+        return self.session_expiry - time.time() <= seconds
 
-    def update_accounts(self, accounts):
+    def update_accounts(self, accounts: list[Account]):
         """Update accounts."""
         self.accounts = accounts
+        self._accounts_by_id = {str(account.id): account for account in accounts}
+
+    def update_account(self, account: Account):
+        """Update a single account."""
+        key = str(account.id)
+        self.accounts = [
+            account if str(known.id) == key else known for known in self.accounts
+        ]
+        if key not in self._accounts_by_id:
+            self.accounts.append(account)
+        self._accounts_by_id[key] = account
 
     def update_account_transactions(self, account_id, transactions):
         """Update transactions."""
         self.account_transactions[str(account_id)] = transactions
+        self._transactions_by_id[str(account_id)] = {
+            transaction.id: transaction for transaction in transactions
+        }
+
+    def merge_account_transactions(self, account_id, transactions, limit):
+        """Add newer transactions in front of the known ones.
+
+        Returns the transactions that were not known yet. Nothing is returned for
+        the first transactions of an account, as there is nothing to compare with.
+        """
+        if len(transactions) == 0 and str(account_id) in self.account_transactions:
+            return []
+        known = self.account_transactions.get(str(account_id), [])
+        known_by_id = self._transactions_by_id.get(str(account_id))
+        added = []
+        if known_by_id is not None:
+            added = [
+                transaction
+                for transaction in transactions
+                if transaction.id not in known_by_id
+            ]
+        new_ids = {transaction.id for transaction in transactions}
+        merged = transactions + [
+            transaction for transaction in known if transaction.id not in new_ids
+        ]
+        self.update_account_transactions(account_id, merged[:limit])
+        return added
+
+    def get_newest_transaction_id(self, account_id):
+        """Get the id of the most recent known transaction of an account."""
+        transactions = self._transactions_by_id.get(str(account_id))
+        if not transactions:
+            return None
+        return max(transactions)
 
-    def update_cards(self, cards):
+    def get_polled_transaction_id(self, account_id):
+        """Get the transaction id polling resumes from."""
+        polled_id = self.polled_transaction_ids.get(str(account_id))
+        if polled_id is None:
+            return self.get_newest_transaction_id(account_id)
+        return polled_id
+
+    def set_polled_transaction_id(self, account_id, transaction_id):
+        """Record the newest transaction id seen by polling."""
+        if transaction_id is not None:
+            self.polled_transaction_ids[str(account_id)] = transaction_id
+
+    def update_cards(self, cards: list[Card]):
         """Update cards."""
         self.cards = cards
+        self._cards_by_id = {str(card.id): card for card in cards}
+
+    def update_card(self, card: Card):
+        """Update a single card."""
+        key = str(card.id)
+        self.cards = [card if str(known.id) == key else known for known in self.cards]
+        if key not in self._cards_by_id:
+            self.cards.append(card)
+        self._cards_by_id[key] = card
 
-    def get_account(self, account_id):
+    def get_account(self, account_id) -> Account | None:
         """Get account from state."""
-        for account in self.accounts:
-            if str(account["id"]) == str(account_id):
-                return account
+        return self._accounts_by_id.get(str(account_id))
 
-    def get_card(self, card_id):
+    def get_card(self, card_id) -> Card | None:
         """Get card from state."""
-        for card in self.cards:
-            if str(card["id"]) == str(card_id):
-                return card
+        return self._cards_by_id.get(str(card_id))
@@ -0,0 +1,62 @@
+""" Client side rate limiting for the bunq api """
+
+import asyncio
+import time
+from collections import deque
+
+from .const import LOGGER
+
+
+class SlidingWindow:
+    """Allow `rate` requests in any window of `period` seconds, queueing the rest."""
+
+    def __init__(self, rate: int, period: float) -> None:
+        """Initialize an empty window."""
+        self.rate = rate
+        self.period = period
+        # send times of the requests in the current window, oldest first
+        self._sent: deque[float] = deque()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Wait until a request may be sent, return the time waited in seconds."""
+        waited = 0.0
+        # the lock keeps waiting requests in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._sent and self._sent[0] <= now - self.period:
+                    self._sent.popleft()
+                if len(self._sent) < self.rate:
+                    break
+                delay = self._sent[0] + self.period - now
+                await asyncio.sleep(delay)
+                waited += delay
+            self._sent.append(time.monotonic())
+        return waited
+
+
+class BunqRateLimiter:
+    """One sliding window per http method, following the bunq request budgets."""
+
+    def __init__(self, limits: dict) -> None:
+        """Initialize the windows."""
+        self._windows = {
+            method: SlidingWindow(rate, period)
+            for method, (rate, period) in limits.items()
+        }
+        self.delayed_requests = 0
+        self.total_wait = 0.0
+
+    async def acquire(self, method: str) -> float:
+        """Wait for the budget of the given method."""
+        window = self._windows.get(method.upper())
+        if window is None:
+            return 0.0
+
+        waited = await window.acquire()
+        if waited > 0:
+            self.delayed_requests += 1
+            self.total_wait += waited
+            LOGGER.debug("%s request delayed %.2fs by rate limiter", method, waited)
+        return waited
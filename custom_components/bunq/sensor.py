@@ -7,6 +7,7 @@ from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from .bunq_balance_sensor import BunqBalanceSensor
 from .bunq_card_sensor import BunqCardSensor
+from .bunq_diagnostic_sensor import DIAGNOSTIC_SENSORS, BunqDiagnosticSensor
 from .const import DOMAIN
 from .coordinator import BunqDataUpdateCoordinator
 
@@ -16,6 +17,7 @@ async def async_setup_entry(
 ) -> None:
     """Set up a bunq sensor entry."""
     coordinator: BunqDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    coordinator.async_load_account_entities()
     sensors = []
     for account in coordinator.bunq.status.accounts:
         sensors.append(BunqBalanceSensor(coordinator, account))
@@ -23,6 +25,9 @@ async def async_setup_entry(
     for card in coordinator.bunq.status.cards:
         sensors.append(BunqCardSensor(coordinator, card))
 
+    for description in DIAGNOSTIC_SENSORS:
+        sensors.append(BunqDiagnosticSensor(coordinator, description))
+
     async_add_entities(
         sensors
     )
\ No newline at end of file
@@ -1,8 +1,11 @@
+from functools import partial
+
 import voluptuous as vol
 from custom_components.bunq.coordinator import BunqDataUpdateCoordinator
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceResponse, SupportsResponse
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
 from .exceptions import BunqApiError
 from .const import (
     ATTR_ACCOUNT_ENTITY,
@@ -10,9 +13,18 @@ from .const import (
     ATTR_AMOUNT,
     ATTR_CARD_ENTITY,
     ATTR_CARD_ID,
+    ATTR_COUNTERPARTY,
+    ATTR_DESCRIPTION,
+    ATTR_END,
     ATTR_FROM_ACCOUNT_ENTITY,
+    ATTR_LIMIT,
+    ATTR_MAX_AMOUNT,
     ATTR_MESSAGE,
+    ATTR_MIN_AMOUNT,
+    ATTR_OFFSET,
+    ATTR_START,
     ATTR_TO_ACCOUNT_ENTITY,
+    ATTR_TRANSFERS,
     DOMAIN,
     LOGGER,
 )
@@ -26,6 +38,49 @@ SERVICE_TRANSFER_SCHEMA = vol.Schema(
     }
 )
 
+SERVICE_TRANSFER_BATCH_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_FROM_ACCOUNT_ENTITY): cv.string,
+        vol.Required(ATTR_TRANSFERS): vol.All(
+            cv.ensure_list,
+            vol.Length(min=1),
+            [
+                vol.Schema(
+                    {
+                        vol.Required(ATTR_TO_ACCOUNT_ENTITY): cv.string,
+                        vol.Required(ATTR_AMOUNT): vol.Coerce(float),
+                        vol.Optional(ATTR_MESSAGE): cv.string,
+                    }
+                )
+            ],
+        ),
+    }
+)
+
+SERVICE_GET_TRANSACTIONS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ACCOUNT_ENTITY): cv.string,
+    }
+)
+
+SERVICE_QUERY_TRANSACTIONS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_ACCOUNT_ENTITY): cv.string,
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_MIN_AMOUNT): vol.Coerce(float),
+        vol.Optional(ATTR_MAX_AMOUNT): vol.Coerce(float),
+        vol.Optional(ATTR_COUNTERPARTY): cv.string,
+        vol.Optional(ATTR_DESCRIPTION): cv.string,
+        vol.Optional(ATTR_LIMIT, default=100): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=1000)
+        ),
+        vol.Optional(ATTR_OFFSET, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+    }
+)
+
 SERVICE_LINK_ACCOUNT_SCHEMA = vol.Schema(
     {
         vol.Required(ATTR_ACCOUNT_ENTITY): cv.string,
@@ -39,29 +94,34 @@ async def async_setup_services(
 ):
     """Setup services for bunq."""
 
+    def get_account_id(entity_id):
+        """Get the bunq account id of a balance sensor."""
+        state = hass.states.get(entity_id)
+        if state is None or ATTR_ACCOUNT_ID not in state.attributes:
+            raise HomeAssistantError(f"Could not find account id for entity {entity_id}")
+        return state.attributes[ATTR_ACCOUNT_ID]
+
+    def get_card_id(entity_id):
+        """Get the bunq card id of a card sensor."""
+        state = hass.states.get(entity_id)
+        if state is None or ATTR_CARD_ID not in state.attributes:
+            raise HomeAssistantError(f"Could not find card id for entity {entity_id}")
+        return state.attributes[ATTR_CARD_ID]
+
     async def transfer_service(call):
         """Execute a transfer via bunq."""
 
-        from_account_entity = call.data.get(ATTR_FROM_ACCOUNT_ENTITY)
-        to_account_entity = call.data.get(ATTR_TO_ACCOUNT_ENTITY)
+        from_account_id = get_account_id(call.data.get(ATTR_FROM_ACCOUNT_ENTITY))
+        to_account_id = get_account_id(call.data.get(ATTR_TO_ACCOUNT_ENTITY))
         amount = call.data.get(ATTR_AMOUNT)
         message = call.data.get(ATTR_MESSAGE) or ""
 
-        if ATTR_ACCOUNT_ID not in hass.states.get(from_account_entity).attributes:
-            raise HomeAssistantError(
-                f"Could not find account id for entity {from_account_entity}"
-            )
-        from_account_id = hass.states.get(from_account_entity).attributes[
-            ATTR_ACCOUNT_ID
-        ]
-        if ATTR_ACCOUNT_ID not in hass.states.get(to_account_entity).attributes:
-            raise HomeAssistantError(
-                f"Could not find account id for entity {to_account_entity}"
-            )
-        to_account_id = hass.states.get(to_account_entity).attributes[ATTR_ACCOUNT_ID]
-
         LOGGER.debug(
-            f"transfer {amount} from {from_account_id} to {to_account_id} (message: '{message}')"
+            "transfer %s from %s to %s (message: '%s')",
+            amount,
+            from_account_id,
+            to_account_id,
+            message,
         )
         try:
             await coordinator.bunq.transfer(
@@ -69,28 +129,84 @@ async def async_setup_services(
             )
         except BunqApiError as e:
             raise HomeAssistantError(e.get_message()) from e
+        await coordinator.async_refresh_accounts([from_account_id, to_account_id])
 
-    async def link_account_service(call):
-        """Link an account to a card."""
+    async def transfer_batch_service(call):
+        """Execute several transfers via bunq in one request."""
 
-        account_entity = call.data.get(ATTR_ACCOUNT_ENTITY)
-        card_entity = call.data.get(ATTR_CARD_ENTITY)
+        from_account_id = get_account_id(call.data.get(ATTR_FROM_ACCOUNT_ENTITY))
+        transfers = [
+            (
+                get_account_id(transfer[ATTR_TO_ACCOUNT_ENTITY]),
+                transfer[ATTR_AMOUNT],
+                transfer.get(ATTR_MESSAGE) or "",
+            )
+            for transfer in call.data[ATTR_TRANSFERS]
+        ]
+
+        LOGGER.debug("transfer batch of %d from %s", len(transfers), from_account_id)
+        try:
+            await coordinator.bunq.transfer_batch(from_account_id, transfers)
+        except BunqApiError as e:
+            raise HomeAssistantError(e.get_message()) from e
+        await coordinator.async_refresh_accounts(
+            [from_account_id, *dict.fromkeys(transfer[0] for transfer in transfers)]
+        )
 
-        if ATTR_CARD_ID not in hass.states.get(card_entity).attributes:
-            raise HomeAssistantError(f"Could not find card id for entity {card_entity}")
-        card_id = hass.states.get(card_entity).attributes[ATTR_CARD_ID]
+    async def link_account_service(call):
+        """Link an account to a card."""
 
-        if ATTR_ACCOUNT_ID not in hass.states.get(account_entity).attributes:
-            raise HomeAssistantError(
-                f"Could not find account id for entity {account_entity}"
-            )
-        account_id = hass.states.get(account_entity).attributes[ATTR_ACCOUNT_ID]
+        card_id = get_card_id(call.data.get(ATTR_CARD_ENTITY))
+        account_id = get_account_id(call.data.get(ATTR_ACCOUNT_ENTITY))
 
-        LOGGER.debug(f"Linking account {account_id} to card {card_id}")
+        LOGGER.debug("Linking account %s to card %s", account_id, card_id)
         try:
             await coordinator.bunq.link_account_to_card(card_id, account_id)
         except BunqApiError as e:
             raise HomeAssistantError(e.get_message()) from e
+        await coordinator.async_refresh_card(card_id)
+
+    async def get_transactions_service(call) -> ServiceResponse:
+        """Return the recent transactions of an account kept in memory."""
+
+        account_id = get_account_id(call.data.get(ATTR_ACCOUNT_ENTITY))
+
+        transactions = coordinator.bunq.status.account_transactions.get(
+            str(account_id), []
+        )
+        return {
+            "transactions": [transaction.as_dict() for transaction in transactions]
+        }
+
+    async def query_transactions_service(call) -> ServiceResponse:
+        """Query the local transaction history."""
+
+        account_id = None
+        account_entity = call.data.get(ATTR_ACCOUNT_ENTITY)
+        if account_entity is not None:
+            account_id = get_account_id(account_entity)
+
+        def to_created(value):
+            """Format a datetime like the bunq created timestamps (UTC)."""
+            if value is None:
+                return None
+            return dt_util.as_utc(value).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+        transactions, total = await hass.async_add_executor_job(
+            partial(
+                coordinator.transactions.query_transactions,
+                account_id=account_id,
+                start=to_created(call.data.get(ATTR_START)),
+                end=to_created(call.data.get(ATTR_END)),
+                min_amount=call.data.get(ATTR_MIN_AMOUNT),
+                max_amount=call.data.get(ATTR_MAX_AMOUNT),
+                counterparty=call.data.get(ATTR_COUNTERPARTY),
+                description=call.data.get(ATTR_DESCRIPTION),
+                limit=call.data[ATTR_LIMIT],
+                offset=call.data[ATTR_OFFSET],
+            )
+        )
+        return {"transactions": transactions, "total": total}
 
     hass.services.async_register(
         DOMAIN,
@@ -98,6 +214,26 @@ async def async_setup_services(
         transfer_service,
         schema=SERVICE_TRANSFER_SCHEMA,
     )
+    hass.services.async_register(
+        DOMAIN,
+        "transfer_batch",
+        transfer_batch_service,
+        schema=SERVICE_TRANSFER_BATCH_SCHEMA,
+    )
     hass.services.async_register(
         DOMAIN, "link_account", link_account_service, schema=SERVICE_LINK_ACCOUNT_SCHEMA
     )
+    hass.services.async_register(
+        DOMAIN,
+        "get_transactions",
+        get_transactions_service,
+        schema=SERVICE_GET_TRANSACTIONS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        "query_transactions",
+        query_transactions_service,
+        schema=SERVICE_QUERY_TRANSACTIONS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
@@ -0,0 +1,197 @@
+""" Local persistent store of bunq transactions """
+
+import sqlite3
+import threading
+
+from .models import Payment
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payment (
+    id INTEGER PRIMARY KEY,
+    account_id INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    description TEXT NOT NULL,
+    type TEXT NOT NULL,
+    counterparty TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS payment_account_created ON payment (account_id, created);
+CREATE INDEX IF NOT EXISTS payment_counterparty
+    ON payment (counterparty COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS backfill (
+    account_id INTEGER PRIMARY KEY,
+    done INTEGER NOT NULL
+);
+"""
+
+
+class BunqTransactionStore:
+    """SQLite store holding the transaction history of all accounts.
+
+    The methods are blocking and meant to be run in the executor.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize the store, the database is opened on first use."""
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("the transaction store is closed")
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._closed = True
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def add_transactions(self, account_id, transactions: list[Payment]) -> None:
+        """Store transactions of an account, known ones are replaced."""
+        rows = [
+            (
+                transaction.id,
+                int(account_id),
+                transaction.created,
+                transaction.amount,
+                transaction.currency,
+                transaction.description,
+                transaction.type,
+                transaction.counterparty,
+            )
+            for transaction in transactions
+        ]
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO payment VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def get_recent_transactions(self, limit) -> dict[str, list[Payment]]:
+        """Get the most recent stored transactions of each account, newest first."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT * FROM ("
+                " SELECT *, ROW_NUMBER() OVER ("
+                "  PARTITION BY account_id ORDER BY id DESC"
+                " ) AS position FROM payment"
+                ") WHERE position <= ? ORDER BY account_id, id DESC",
+                (limit,),
+            )
+            transactions: dict[str, list[Payment]] = {}
+            for row in rows:
+                transactions.setdefault(str(row["account_id"]), []).append(
+                    Payment(
+                        id=row["id"],
+                        created=row["created"],
+                        amount=row["amount"],
+                        currency=row["currency"],
+                        description=row["description"],
+                        type=row["type"],
+                        counterparty=row["counterparty"],
+                    )
+                )
+            return transactions
+
+    def get_oldest_transaction_id(self, account_id):
+        """Get the id of the oldest stored transaction of an account."""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT MIN(id) FROM payment WHERE account_id = ?",
+                    (int(account_id),),
+                )
+                .fetchone()
+            )
+            return row[0]
+
+    def is_backfilled(self, account_id) -> bool:
+        """Check if the full history of an account has been stored."""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT done FROM backfill WHERE account_id = ?", (int(account_id),)
+                )
+                .fetchone()
+            )
+            return row is not None and bool(row[0])
+
+    def set_backfilled(self, account_id) -> None:
+        """Mark the full history of an account as stored."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO backfill VALUES (?, 1)", (int(account_id),)
+                )
+
+    def query_transactions(
+        self,
+        *,
+        account_id=None,
+        start=None,
+        end=None,
+        min_amount=None,
+        max_amount=None,
+        counterparty=None,
+        description=None,
+        limit=100,
+        offset=0,
+    ) -> tuple[list, int]:
+        """Get the stored transactions matching all given filters, most recent first.
+
+        start and end are compared with the bunq created timestamps, the
+        counterparty has to match exactly (ignoring case) and description is a
+        substring match. Returns one page of transactions and the total number
+        of matches.
+        """
+        conditions = []
+        params = []
+        if account_id is not None:
+            conditions.append("account_id = ?")
+            params.append(int(account_id))
+        if start is not None:
+            conditions.append("created >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("created < ?")
+            params.append(end)
+        if min_amount is not None:
+            conditions.append("amount >= ?")
+            params.append(min_amount)
+        if max_amount is not None:
+            conditions.append("amount <= ?")
+            params.append(max_amount)
+        if counterparty is not None:
+            conditions.append("counterparty = ? COLLATE NOCASE")
+            params.append(counterparty)
+        if description is not None:
+            conditions.append("instr(lower(description), lower(?)) > 0")
+            params.append(description)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            connection = self._connect()
+            total = connection.execute(
+                f"SELECT COUNT(*) FROM payment {where}", params
+            ).fetchone()[0]
+            rows = connection.execute(
+                f"SELECT * FROM payment {where} ORDER BY created DESC, id DESC"
+                " LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+        return [dict(row) for row in rows], total
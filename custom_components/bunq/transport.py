@@ -0,0 +1,187 @@
+""" Transports sending the http requests of the bunq api """
+from __future__ import annotations
+
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import socket
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import async_timeout
+from aiohttp import ClientError, ClientSession
+
+from .debug_log import redact
+from .exceptions import (
+    BunqApiConnectionError,
+    BunqApiConnectionTimeoutError,
+    BunqApiError,
+)
+
+
+@dataclass
+class TransportResponse:
+    """A response as seen by BunqApi."""
+
+    status: int
+    content_type: str
+    body: bytes
+
+
+class BunqTransport(ABC):
+    """Send a request and return its response."""
+
+    @abstractmethod
+    async def send(self, method, url, headers, **kwargs) -> TransportResponse:
+        """Send a request, raise BunqApiConnectionError when bunq can't be reached."""
+
+
+class AiohttpTransport(BunqTransport):
+    """Send requests to bunq with aiohttp."""
+
+    def __init__(self, session: ClientSession, request_timeout: int) -> None:
+        """Initialize the transport."""
+        self._session = session
+        self.request_timeout = request_timeout
+
+    async def send(self, method, url, headers, **kwargs) -> TransportResponse:
+        """Send a request to bunq."""
+        response = None
+        try:
+            async with async_timeout.timeout(self.request_timeout):
+                response = await self._session.request(
+                    method,
+                    url,
+                    **kwargs,
+                    headers=headers,
+                )
+                body = await response.read()
+        except asyncio.TimeoutError as exception:
+            raise BunqApiConnectionTimeoutError(
+                "Timeout occurred while connecting to the Bunq API"
+            ) from exception
+        except (ClientError, socket.gaierror) as exception:
+            raise BunqApiConnectionError(
+                "Error occurred while communicating with the Bunq API"
+            ) from exception
+        finally:
+            if response is not None:
+                response.close()
+
+        return TransportResponse(
+            response.status, response.headers.get("Content-Type", ""), body
+        )
+
+
+def _path(url) -> str:
+    parts = urlsplit(url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+
+def _redact_body(body):
+    """Redact a json body, given as text or bytes."""
+    if body is None:
+        return None
+    try:
+        return json.dumps(redact(json.loads(body)))
+    except ValueError:
+        return body.decode("utf8") if isinstance(body, bytes) else body
+
+
+class RecordingTransport(BunqTransport):
+    """Record every exchange of another transport to a JSONL cassette.
+
+    Secrets in the request and response bodies are redacted, headers are not
+    recorded.
+    """
+
+    def __init__(self, transport: BunqTransport, path: str) -> None:
+        """Initialize the transport."""
+        self._transport = transport
+        self.path = path
+
+    async def send(self, method, url, headers, **kwargs) -> TransportResponse:
+        """Send a request and record it."""
+        exchange = {
+            "method": method,
+            "path": _path(url),
+            "request": _redact_body(
+                kwargs.get("data")
+                if "json" not in kwargs
+                else json.dumps(kwargs["json"])
+            ),
+        }
+        started = time.monotonic()
+        try:
+            response = await self._transport.send(method, url, headers, **kwargs)
+        except BunqApiConnectionError as error:
+            exchange["elapsed"] = time.monotonic() - started
+            exchange["error"] = (
+                "timeout" if isinstance(error, BunqApiConnectionTimeoutError) else "connection"
+            )
+            await self._write(exchange)
+            raise
+        exchange["elapsed"] = time.monotonic() - started
+        exchange["status"] = response.status
+        exchange["content_type"] = response.content_type
+        exchange["response"] = _redact_body(response.body)
+        await self._write(exchange)
+        return response
+
+    async def _write(self, exchange) -> None:
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._append, json.dumps(exchange) + "\n"
+        )
+
+    def _append(self, line: str) -> None:
+        with open(self.path, "a", encoding="utf8") as cassette:
+            cassette.write(line)
+
+
+def _read_cassette(path: str) -> list[dict]:
+    with open(path, encoding="utf8") as cassette:
+        return [json.loads(line) for line in cassette if line.strip()]
+
+
+class ReplayTransport(BunqTransport):
+    """Serve the exchanges of a cassette instead of calling bunq.
+
+    Exchanges are matched on method and path, in recorded order. time_scale
+    multiplies the recorded durations: 1 replays the original timing, 0 runs
+    at full speed. Create it with load().
+    """
+
+    def __init__(self, exchanges: list[dict], time_scale: float = 0.0) -> None:
+        """Initialize the transport with the recorded exchanges."""
+        self.time_scale = time_scale
+        self._exchanges = defaultdict(deque)
+        for exchange in exchanges:
+            self._exchanges[(exchange["method"], exchange["path"])].append(exchange)
+
+    @classmethod
+    async def load(cls, path: str, time_scale: float = 0.0) -> ReplayTransport:
+        """Read a cassette in the executor and return its transport."""
+        exchanges = await asyncio.get_running_loop().run_in_executor(
+            None, _read_cassette, path
+        )
+        return cls(exchanges, time_scale)
+
+    async def send(self, method, url, headers, **kwargs) -> TransportResponse:
+        """Serve the next recorded exchange of the request."""
+        exchanges = self._exchanges.get((method, _path(url)))
+        if not exchanges:
+            raise BunqApiError(f"no recorded exchange for {method} {_path(url)}")
+        exchange = exchanges.popleft()
+        if self.time_scale:
+            await asyncio.sleep(exchange["elapsed"] * self.time_scale)
+        if exchange.get("error") == "timeout":
+            raise BunqApiConnectionTimeoutError("Recorded timeout")
+        if "error" in exchange:
+            raise BunqApiConnectionError("Recorded connection error")
+        return TransportResponse(
+            exchange["status"],
+            exchange["content_type"],
+            (exchange["response"] or "").encode("utf8"),
+        )